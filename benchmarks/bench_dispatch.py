@@ -0,0 +1,196 @@
+"""
+Replays a corpus of chat messages through messagehandle.handle_string and
+reports throughput, latency percentiles and allocations.
+
+    python benchmarks/bench_dispatch.py                      # synthetic corpus
+    python benchmarks/bench_dispatch.py --corpus chat.txt    # one message per line
+    python benchmarks/bench_dispatch.py --save-baseline baseline.json
+    python benchmarks/bench_dispatch.py --baseline baseline.json
+
+Network handlers are answered by a stub client, so only bytie's own code is
+measured. With --baseline the script exits with status 1 if throughput or p99
+latency got worse than the stored numbers by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bytie"))
+
+import httpclient  # noqa: E402
+import messagehandle  # noqa: E402
+
+CHATTER = [
+    "good morning everyone",
+    "did anyone watch the match last night?",
+    "I think the build is broken again",
+    "lol",
+    "can someone review my PR",
+    "python 3.12 is out",
+    "bytie is slow today",
+    "who wants coffee",
+    "ok",
+    "this is fine :fire:",
+]
+
+COMMANDS = [
+    "ast x = [i ** 2 for i in range(10)]",
+    "ast def f(a, b):\n    return a + b",
+    "8ball will the deploy go well?",
+    "8ball is java better than python",
+    "fft 1 2 3 4 5 6 7 8",
+    "fft 1,0,-1,0,1,0,-1,0",
+    "lambada (+ 1 (* 2 3))",
+    "lambada (def sq (fn (list x) (* x x)))",
+    "lambada (funcall sq (list 12))",
+    "|> 8ball hello |> iplikisyin",
+    "|> split , a,b,c,d |> take 1 3",
+    "hey bytie!",
+    "python",
+    "ebobekok 12, 18, 24",
+    "tdk kalem",
+    "XTRY EUR",
+    "usd",
+    "!xkcd 614",
+    "mandelbrot -0.5 0 1 30 4",
+]
+
+# (share of the corpus, messages)
+MIX = [(0.85, CHATTER), (0.15, COMMANDS)]
+
+
+class StubResponse:
+    def __init__(self, body, status_code=200):
+        self.status_code = status_code
+        self.text = body if isinstance(body, str) else json.dumps(body)
+        self.content = self.text.encode("utf-8")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class StubClient:
+    "Answers every request the handlers make without touching the network."
+
+    routes = [
+        ("sozluk.gov.tr", [{"anlamlarListe": [
+            {"anlam": "Yazı yazmaya yarayan araç", "ozelliklerListe": [{"tam_adi": "isim"}]}]}]),
+        ("exchangeratesapi.io", {"rates": {"EUR": 0.029, "USD": 0.031}}),
+        ("themoneyconverter.com", "<p>1 USD = 32.1000 TRY</p>"),
+        ("xkcd.com/info.0.json", {"num": 2900}),
+        ("xkcd.com", {"img": "https://imgs.xkcd.com/comics/stub.png"}),
+        ("icanhazdadjoke.com", {"id": "stub"}),
+    ]
+
+    def get(self, url, headers=None, **kwargs):
+        for needle, body in self.routes:
+            if needle in url:
+                return StubResponse(body)
+        return StubResponse("", 404)
+
+
+def synthetic_corpus(n: int, seed: int) -> list:
+    rng = random.Random(seed)
+    weights = [share for share, _ in MIX]
+    pools = [messages for _, messages in MIX]
+    return [rng.choice(rng.choices(pools, weights)[0]) for _ in range(n)]
+
+
+def load_corpus(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        # recorded corpora escape newlines inside a message as \n
+        return [line.rstrip("\n").replace("\\n", "\n") for line in f if line.strip()]
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def replay(corpus: list) -> dict:
+    latencies = []
+    start = time.perf_counter()
+    for text in corpus:
+        t0 = time.perf_counter()
+        messagehandle.handle_string(text)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "messages": len(corpus),
+        "messages_per_sec": len(corpus) / elapsed,
+        "p50_us": percentile(latencies, 0.50) * 1e6,
+        "p99_us": percentile(latencies, 0.99) * 1e6,
+    }
+
+
+def allocations(corpus: list) -> dict:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for text in corpus:
+        messagehandle.handle_string(text)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    return {
+        "retained_blocks_per_message": blocks / len(corpus),
+        "peak_traced_kib": peak / 1024,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    problems = []
+    if result["messages_per_sec"] < baseline["messages_per_sec"] * (1 - tolerance):
+        problems.append(
+            f"throughput {result['messages_per_sec']:.0f} msg/s < baseline {baseline['messages_per_sec']:.0f} msg/s")
+    if result["p99_us"] > baseline["p99_us"] * (1 + tolerance):
+        problems.append(f"p99 {result['p99_us']:.1f} us > baseline {baseline['p99_us']:.1f} us")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="file with one chat message per line")
+    parser.add_argument("-n", type=int, default=20000, help="size of the synthetic corpus")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--warmup", type=int, default=1000)
+    parser.add_argument("--baseline", help="compare against this baseline json")
+    parser.add_argument("--save-baseline", help="store the result as a baseline json")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.n, args.seed)
+    random.seed(args.seed)
+    httpclient.use(StubClient())
+    messagehandle.PATH = tempfile.mkdtemp(prefix="bytie-bench-")
+
+    for text in corpus[:args.warmup]:
+        messagehandle.handle_string(text)
+
+    result = replay(corpus)
+    result.update(allocations(corpus[:min(len(corpus), 5000)]))
+
+    for key, value in result.items():
+        print(f"{key:>30}: {value:,.2f}" if isinstance(value, float) else f"{key:>30}: {value}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(result, json.load(f), args.tolerance)
+        for problem in problems:
+            print("REGRESSION:", problem)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
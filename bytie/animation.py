@@ -0,0 +1,100 @@
+import struct
+import zlib
+
+import numpy as np
+from PIL import Image, GifImagePlugin
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _palette_bytes(palette) -> bytes:
+    "256 RGB entries as 768 bytes, padded with black."
+    data = np.asarray(palette, dtype=np.uint8).reshape(-1, 3)[:256].tobytes()
+    return data + bytes(768 - len(data))
+
+
+class ApngWriter:
+    """
+    Writes an animated PNG frame by frame to the binary file fp, so only the
+    current frame is held in memory. Frames are 2D uint8 arrays of palette
+    indices; the number of frames is part of the header and has to be known
+    up front.
+    """
+
+    def __init__(self, fp, size, frames: int, palette, delay_ms: int = 40, loop: int = 0,
+                 compress_level: int = 1):
+        self.fp = fp
+        self.width, self.height = size
+        self.frames = frames
+        self.delay_ms = delay_ms
+        self.compress_level = compress_level
+        self.sequence = 0
+        self.written = 0
+        fp.write(PNG_SIGNATURE)
+        # 8 bit palette image
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 3, 0, 0, 0))
+        self._chunk(b"PLTE", _palette_bytes(palette))
+        self._chunk(b"acTL", struct.pack(">II", frames, loop))
+
+    def _chunk(self, kind: bytes, data: bytes):
+        self.fp.write(struct.pack(">I", len(data)) + kind + data)
+        self.fp.write(struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    def add(self, frame):
+        if self.written == self.frames:
+            raise ValueError(f"the animation has only {self.frames} frames")
+        frame = np.asarray(frame, dtype=np.uint8)
+        if frame.shape != (self.height, self.width):
+            raise ValueError(f"frame of shape {frame.shape}, expected {(self.height, self.width)}")
+        self._chunk(b"fcTL", struct.pack(">IIIIIHHBB", self.sequence, self.width, self.height,
+                                         0, 0, self.delay_ms, 1000, 0, 0))
+        self.sequence += 1
+        # every scanline starts with filter type 0
+        rows = np.empty((self.height, self.width + 1), dtype=np.uint8)
+        rows[:, 0] = 0
+        rows[:, 1:] = frame
+        data = zlib.compress(rows.tobytes(), self.compress_level)
+        if self.written == 0:
+            self._chunk(b"IDAT", data)
+        else:
+            self._chunk(b"fdAT", struct.pack(">I", self.sequence) + data)
+            self.sequence += 1
+        self.written += 1
+
+    def close(self):
+        if self.written != self.frames:
+            raise ValueError(f"{self.written} of {self.frames} frames written")
+        self._chunk(b"IEND", b"")
+
+
+class GifWriter:
+    """
+    Writes an animated GIF frame by frame to the binary file fp. Frames are
+    2D uint8 arrays of indices into one global palette, so no frame has to be
+    quantized; PIL does the LZW compression of each frame.
+    """
+
+    def __init__(self, fp, size, palette, delay_ms: int = 40, loop: int = 0):
+        self.fp = fp
+        self.width, self.height = size
+        self.palette = _palette_bytes(palette)
+        self.delay_ms = delay_ms
+        self.written = 0
+        fp.write(b"GIF89a")
+        # global color table of 256 entries, background 0
+        fp.write(struct.pack("<HHBBB", self.width, self.height, 0xF7, 0, 0))
+        fp.write(self.palette)
+        fp.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+
+    def add(self, frame):
+        frame = np.asarray(frame, dtype=np.uint8)
+        if frame.shape != (self.height, self.width):
+            raise ValueError(f"frame of shape {frame.shape}, expected {(self.height, self.width)}")
+        image = Image.fromarray(frame, "P")
+        image.putpalette(self.palette)
+        for part in GifImagePlugin.getdata(image, duration=self.delay_ms):
+            self.fp.write(part)
+        self.written += 1
+
+    def close(self):
+        self.fp.write(b";")
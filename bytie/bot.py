@@ -1,24 +1,66 @@
 # bot.py
-from messagehandle import message_handlers
+import time
+
+STARTED = time.perf_counter()
+
+from messagehandle import match_handlers, invoke, observe
+from executor import HandlerExecutor
+from outbox import Outbox
+from scheduler import Scheduler
+import lazy
+import metrics
+
+IMPORTED = time.perf_counter()
 
 import os
 import ast
+import asyncio
+import io
 import random
-import textwrap
 
 import discord
 
 TOKEN = os.environ["DISCORD_TOKEN"]
+METRICS_PORT = int(os.getenv("BYTIE_METRICS_PORT", "9108"))
+# import the heavy handler dependencies in the background once connected
+WARMUP = os.getenv("BYTIE_WARMUP", "1") == "1"
 
 
 intents = discord.Intents.default()
 intents.message_content = True
 client = discord.Client(intents=intents)
+executor = HandlerExecutor(invoke, observe=observe)
+scheduler = Scheduler(executor.run)
+outbox = Outbox(make_file=lambda data, filename: discord.File(io.BytesIO(data), filename=filename))
+lag_watcher = None
+
+
+async def watch_event_loop(interval: float = 0.5):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        metrics.event_loop_lag.observe(max(0.0, loop.time() - start - interval))
+
+
+async def warm_up():
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    await loop.run_in_executor(None, lazy.warm_up)
+    print(f"Warm-up imports took {time.perf_counter() - start:.2f}s:\n{lazy.report()}")
 
 
 @client.event
 async def on_ready():
+    global lag_watcher
     print(f"{client.user.name} has connected to Discord!")
+    # on_ready fires again after every reconnect
+    if lag_watcher is None:
+        print(f"Startup: handlers imported in {IMPORTED - STARTED:.2f}s, "
+              f"ready after {time.perf_counter() - STARTED:.2f}s")
+        lag_watcher = asyncio.create_task(watch_event_loop())
+        if WARMUP:
+            asyncio.create_task(warm_up())
 
 
 @client.event
@@ -54,17 +96,17 @@ async def on_message(message):
         await message.channel.send("Goodbye cruel world!")
         exit()
 
-    for handler in message_handlers:
-        msg = handler['handler'](incoming)
+    for entry, argument in match_handlers(incoming):
+        # commands start with the handler name, the other matches are random
+        by_chance = not incoming.startswith(entry["name"])
+        msg = await scheduler.submit(entry, argument, message.author.id, message.channel.id, by_chance)
         if not msg:
             continue
+        outbox.put(message.channel, msg)
 
-        for part in textwrap.wrap(
-            msg,
-            1300,
-            drop_whitespace=False,
-            replace_whitespace=False
-        ):
-            await message.channel.send(part)
 
-client.run(TOKEN)
+# the handler process pools import this module in their workers
+if __name__ == "__main__":
+    if METRICS_PORT:
+        metrics.start_http_server(METRICS_PORT)
+    client.run(TOKEN)
@@ -0,0 +1,138 @@
+import functools
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import singleflight
+except Exception:
+    from . import singleflight
+
+
+def sizeof(value) -> int:
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (list, tuple, dict)):
+        return len(repr(value))
+    return sys.getsizeof(value)
+
+
+class TTLCache:
+    """
+    Bounded cache for remote lookups. Entries live for ttl seconds and the
+    least recently used ones are evicted when there are more than maxsize
+    entries or more than maxbytes in total. Entries that expired less than
+    stale_ttl seconds ago are still returned, marked as stale, so the caller
+    can refresh them in the background.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 256, maxbytes: int = 1024 * 1024,
+                 stale_ttl: float = 0, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self.data = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        "Returns (found, value, fresh)."
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                self.misses += 1
+                return False, None, False
+            value, size, expires = item
+            now = self.clock()
+            if now >= expires + self.stale_ttl:
+                self._delete(key)
+                self.misses += 1
+                return False, None, False
+            self.data.move_to_end(key)
+            self.hits += 1
+            return True, value, now < expires
+
+    def set(self, key, value):
+        size = sizeof(value)
+        with self.lock:
+            if key in self.data:
+                self._delete(key)
+            if size > self.maxbytes:
+                return
+            self.data[key] = (value, size, self.clock() + self.ttl)
+            self.bytes += size
+            while len(self.data) > self.maxsize or self.bytes > self.maxbytes:
+                self._delete(next(iter(self.data)))
+
+    def _delete(self, key):
+        _, size, _ = self.data.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self.data)
+
+
+def cached(ttl: float, maxsize: int = 256, maxbytes: int = 1024 * 1024,
+           stale_while_revalidate: float = 0, key=None):
+    """
+    Caches the results of a remote lookup function.
+
+    key(*args) normalizes the arguments into the cache key. None results are
+    not cached so a failed lookup is retried next time. With
+    stale_while_revalidate, a recently expired value is returned at once and
+    refreshed in a background thread. Concurrent misses on the same key share
+    one call of func.
+    """
+    def decorator(func):
+        cache = TTLCache(ttl, maxsize, maxbytes, stale_while_revalidate)
+        flight = singleflight.SingleFlight()
+        refreshing = set()
+        refreshing_lock = threading.Lock()
+
+        def fetch(k, args):
+            value = func(*args)
+            if value is not None:
+                cache.set(k, value)
+            return value
+
+        def load(k, args):
+            return flight.do(k, fetch, k, args)
+
+        def refresh(k, args):
+            try:
+                load(k, args)
+            except Exception:
+                pass
+            finally:
+                with refreshing_lock:
+                    refreshing.discard(k)
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            k = key(*args) if key else args
+            found, value, fresh = cache.get(k)
+            if found:
+                if not fresh:
+                    with refreshing_lock:
+                        start = k not in refreshing
+                        refreshing.add(k)
+                    if start:
+                        threading.Thread(target=refresh, args=(k, args), daemon=True).start()
+                return value
+            return load(k, args)
+
+        wrapper.cache = cache
+        wrapper.flight = flight
+        return wrapper
+
+    return decorator
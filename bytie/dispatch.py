@@ -0,0 +1,71 @@
+import random
+
+
+class _Node:
+    __slots__ = ("children", "exact", "prefix")
+
+    def __init__(self):
+        self.children = {}
+        self.exact = []
+        self.prefix = []
+
+
+class CommandIndex:
+    """
+    Routes an incoming message to the handlers registered with @message_handler.
+
+    Handler names are kept in a character trie, so finding the handlers whose
+    name starts a message costs O(length of the command) no matter how many
+    handlers are registered. Handlers that also fire by chance are kept in a
+    separate list and are the only ones that draw a random number.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.random_handlers = []
+        self.size = 0
+
+    def add(self, entry: dict):
+        order = self.size
+        self.size += 1
+
+        node = self.root
+        for ch in entry["name"]:
+            node = node.children.setdefault(ch, _Node())
+        if entry["prefix"]:
+            node.prefix.append((order, entry))
+        else:
+            node.exact.append((order, entry))
+
+        if entry["probability"] > 0:
+            self.random_handlers.append((order, entry))
+
+    def match(self, message: str) -> list:
+        """
+        Return [(entry, argument), ...] for every handler that fires on message,
+        in registration order.
+        """
+        found = []
+        node = self.root
+        length = len(message)
+        for idx, ch in enumerate(message):
+            node = node.children.get(ch)
+            if node is None:
+                break
+            end = idx + 1
+            if end == length:
+                for order, entry in node.exact:
+                    found.append((order, entry, ""))
+            elif message[end] == " ":
+                for order, entry in node.prefix:
+                    found.append((order, entry, message[end + 1:]))
+
+        if self.random_handlers:
+            matched = {order for order, _, _ in found}
+            for order, entry in self.random_handlers:
+                if order not in matched and random.random() < entry["probability"]:
+                    found.append((order, entry, message))
+
+        if len(found) > 1:
+            found.sort(key=lambda item: item[0])
+        return [(entry, argument) for _, entry, argument in found]
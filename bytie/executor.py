@@ -0,0 +1,95 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# How a handler registered with @message_handler is run by the bot.
+INLINE = None
+THREAD = "thread"
+PROCESS = "process"
+
+DEFAULT_CONCURRENCY = {INLINE: None, THREAD: 4, PROCESS: 2}
+
+
+class HandlerExecutor:
+    """
+    Runs message handlers without blocking the asyncio event loop.
+
+    I/O bound handlers (executor="thread") run in a shared thread pool and CPU
+    bound handlers (executor="process") run in a process pool. Each handler has
+    its own semaphore so one busy command can not take all the workers.
+    """
+
+    def __init__(self, invoke, threads: int = 16, processes: int = None, observe=None):
+        # invoke(function, argument) calls a handler function and turns
+        # exceptions into a chat message; it must be picklable.
+        # observe(entry, seconds, result) is told about every finished call.
+        self.invoke = invoke
+        self.observe = observe
+        self.thread_pool = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="bytie-handler")
+        self.processes = processes or os.cpu_count()
+        self.process_pool = None
+        self.semaphores = {}
+
+    def _process_pool(self):
+        if self.process_pool is None:
+            # forking the threaded bot process can copy held locks into the
+            # workers, so they are started from a clean fork server
+            self.process_pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("forkserver"))
+        return self.process_pool
+
+    def _drop_process_pool(self, pool):
+        # a worker died (crash, OOM kill); the pool is unusable from now on
+        if self.process_pool is pool:
+            self.process_pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _semaphore(self, entry: dict):
+        sem = self.semaphores.get(entry["name"])
+        if sem is None:
+            limit = entry.get("concurrency") or DEFAULT_CONCURRENCY[entry.get("executor")]
+            sem = asyncio.Semaphore(limit)
+            self.semaphores[entry["name"]] = sem
+        return sem
+
+    async def run(self, entry: dict, argument: str):
+        start = time.perf_counter()
+        result = await self._run(entry, argument)
+        if self.observe is not None:
+            self.observe(entry, time.perf_counter() - start, result)
+        return result
+
+    async def _run(self, entry: dict, argument: str):
+        mode = entry.get("executor")
+        if mode is INLINE:
+            return self.invoke(entry["function"], argument)
+
+        if mode not in (THREAD, PROCESS):
+            raise ValueError(f"Unknown executor for '{entry['name']}': {mode}")
+
+        loop = asyncio.get_running_loop()
+        async with self._semaphore(entry):
+            if mode == THREAD:
+                return await loop.run_in_executor(
+                    self.thread_pool, self.invoke, entry["function"], argument)
+            # a broken pool fails every call that was in it, not only the one
+            # that killed the worker, so each call gets one more try
+            for retry in (True, False):
+                pool = self._process_pool()
+                try:
+                    return await loop.run_in_executor(
+                        pool, self.invoke, entry["function"], argument)
+                except BrokenProcessPool:
+                    self._drop_process_pool(pool)
+                    if not retry:
+                        raise
+
+    def shutdown(self):
+        self.thread_pool.shutdown(wait=False, cancel_futures=True)
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
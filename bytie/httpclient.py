@@ -0,0 +1,91 @@
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+MAX_BYTES = 2 * 1024 * 1024
+
+
+class ResponseTooLarge(Exception):
+    pass
+
+
+class HttpClient:
+    """
+    One keep-alive connection pool per host, shared by every handler that
+    talks to a remote service. Every request has connect/read timeouts and
+    the body is capped at max_bytes.
+
+    hosts maps "scheme://host" prefixes to other base urls, e.g.
+    {"https://xkcd.com": "http://127.0.0.1:8000"}, so tests can point the
+    handlers at a local stub server.
+    """
+
+    def __init__(self, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_bytes: int = MAX_BYTES,
+                 pool_maxsize: int = 8, hosts: dict = None):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.hosts = dict(hosts or {})
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _rewrite(self, url: str) -> str:
+        if not self.hosts:
+            return url
+        parts = urlsplit(url)
+        base = f"{parts.scheme}://{parts.netloc}"
+        if base in self.hosts:
+            return self.hosts[base] + url[len(base):]
+        return url
+
+    def request(self, method: str, url: str, headers: dict = None, max_bytes: int = None,
+                **kwargs) -> requests.Response:
+        limit = max_bytes or self.max_bytes
+        kwargs.setdefault("timeout", self.timeout)
+        resp = self.session.request(
+            method, self._rewrite(url), headers=headers, stream=True, **kwargs)
+        try:
+            chunks = []
+            size = 0
+            for chunk in resp.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > limit:
+                    raise ResponseTooLarge(f"{url} is larger than {limit} bytes")
+                chunks.append(chunk)
+        finally:
+            # returns the connection to the pool
+            resp.close()
+        resp._content = b"".join(chunks)
+        resp._content_consumed = True
+        return resp
+
+    def get(self, url: str, headers: dict = None, **kwargs) -> requests.Response:
+        return self.request("GET", url, headers=headers, **kwargs)
+
+    def post(self, url: str, headers: dict = None, **kwargs) -> requests.Response:
+        return self.request("POST", url, headers=headers, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+client = HttpClient()
+
+
+def get(url: str, headers: dict = None, **kwargs) -> requests.Response:
+    return client.get(url, headers=headers, **kwargs)
+
+
+def post(url: str, headers: dict = None, **kwargs) -> requests.Response:
+    return client.post(url, headers=headers, **kwargs)
+
+
+def use(new_client: HttpClient) -> HttpClient:
+    "Replaces the shared client and returns the old one."
+    global client
+    old, client = client, new_client
+    return old
@@ -1,6 +1,16 @@
 # Constants
+import operator
+import re
+import threading
+from collections import OrderedDict
 from typing import Dict
-import libstdlambada
+
+try:
+    import lazy
+except Exception:
+    from . import lazy
+
+np = lazy.module("numpy")
 
 TOKEN_LEFT_PARANT = 0
 TOKEN_RIGHT_PARANT = 1
@@ -20,110 +30,412 @@ TOKEN_EQUAL = 13
 
 
 class Token:
-    def __init__(self, type: int, content: str):
+    __slots__ = ("type", "content", "pos")
+
+    def __init__(self, type: int, content, pos: int = -1):
         self.type = type
         self.content = content
+        # offset of the token in the source
+        self.pos = pos
 
     def __str__(self):
         return f"Content: {self.content} - Type: {self.type}"
 # -------------------------------------------
 
 
-# Class Lexer
-class Lexer:
-    state: int = -1
-    source: str = ""
+class LexError(Exception):
+    def __init__(self, message: str, source: str, pos: int):
+        self.line, self.column = position(source, pos)
+        super().__init__(f"{message} at line {self.line}, column {self.column}")
 
-    def __init__(self, source: str):
-        self.state = -1
-        self.source = source
 
-    def reset(self):
-        self.state = 0
+class CallLimit(Exception):
+    "A program made more calls, or nested them deeper, than it may."
 
-    def eat(self):
-        if self.state + 1 < len(self.source):
-            self.state = self.state + 1
-            return self.source[self.state]
-        else:
-            return None
 
-    def putback(self):
-        self.state = self.state - 1
-        if self.state < -1:
-            self.state = -1
+def position(source: str, pos: int):
+    "1-based line and column of the offset pos in source."
+    line = source.count("\n", 0, pos) + 1
+    return line, pos - (source.rfind("\n", 0, pos) + 1) + 1
 
-    def lookforward(self):
-        if self.state + 1 < len(self.source):
-            return self.source(self.state + 1)
-        else:
-            return None
 
-    def nextToken(self):
-        cc = self.eat()
-        if cc == None:
-            return Token(TOKEN_EOF, "-EOF-")
-        elif cc.isspace():
-            return self.nextToken()
-        elif cc == '(':
-            return Token(TOKEN_LEFT_PARANT, "(")
-        elif cc == ')':
-            return Token(TOKEN_RIGHT_PARANT, ")")
-        elif cc == '+':
-            return Token(TOKEN_PLUS, "+")
-        elif cc == '-':
-            return Token(TOKEN_MINUS, "-")
-        elif cc == '*':
-            return Token(TOKEN_PRODUCT, "*")
-        elif cc == '/':
-            return Token(TOKEN_DIVIDE, "/")
-        elif cc == '^':
-            return Token(TOKEN_POW, "^")
-        elif cc == '=':
-            return Token(TOKEN_EQUAL, "=")
-        elif cc == '"':
-            content = cc
-            while True:
-                cc = self.eat()
-                if cc == '"':
-                    break
-                content = content + cc
-            return Token(TOKEN_CONSTANT_STRING, str(content))
-        elif cc.isnumeric():
-            content = cc
-            while True:
-                cc = self.eat()
-                if cc.isnumeric() or cc == ".":
-                    content = content + cc
-                else:
-                    self.putback()
-                    break
-            if content.count(".") > 0:
-                return Token(TOKEN_CONSTANT_NUMBER, float(content))
+# Whitespace and one token, with one alternative per kind of token; a "-"
+# directly followed by a digit starts a negative number, otherwise it is the
+# minus operator. Anything else is an error.
+TOKEN_PATTERN = re.compile(r"""
+    \s*
+    (?:
+        (?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+      | (?P<string>"(?:[^"\\]|\\.)*")
+      | (?P<identifier>[^\W\d]\w*)
+      | (?P<symbol>[()+\-*/^=])
+      | (?P<end>\Z)
+      | (?P<error>.)
+    )
+""", re.VERBOSE | re.DOTALL)
+
+SYMBOLS = {
+    "(": TOKEN_LEFT_PARANT,
+    ")": TOKEN_RIGHT_PARANT,
+    "+": TOKEN_PLUS,
+    "-": TOKEN_MINUS,
+    "*": TOKEN_PRODUCT,
+    "/": TOKEN_DIVIDE,
+    "^": TOKEN_POW,
+    "=": TOKEN_EQUAL,
+}
+
+ESCAPES = {"n": "\n", "t": "\t", '"': '"', "\\": "\\"}
+ESCAPE_PATTERN = re.compile(r"\\(.)", re.DOTALL)
+
+
+def unescape(text: str) -> str:
+    return ESCAPE_PATTERN.sub(lambda m: ESCAPES.get(m.group(1), m.group(0)), text)
+
+
+# Class Lexer
+class Lexer:
+    """
+    Splits lambada source into tokens in a single pass of TOKEN_PATTERN.
+    String tokens hold the text between the quotes with the \n, \t, \" and
+    \\ escapes resolved.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.tokenstream = self.tokens()
+
+    def tokens(self):
+        "Generator of the tokens of the source, ending with an EOF token."
+        source = self.source
+        for m in TOKEN_PATTERN.finditer(source):
+            kind = m.lastgroup
+            text = m.group(kind)
+            pos = m.start(kind)
+            if kind == "identifier":
+                yield Token(TOKEN_IDENTIFIER, text, pos)
+            elif kind == "symbol":
+                yield Token(SYMBOLS[text], text, pos)
+            elif kind == "number":
+                number = float(text) if "." in text or "e" in text or "E" in text else int(text)
+                yield Token(TOKEN_CONSTANT_NUMBER, number, pos)
+            elif kind == "string":
+                yield Token(TOKEN_CONSTANT_STRING, unescape(text[1:-1]) if "\\" in text else text[1:-1], pos)
+            elif kind == "end":
+                break
+            elif text == '"':
+                raise LexError("Unterminated string", source, pos)
             else:
-                return Token(TOKEN_CONSTANT_NUMBER, int(content))
-        elif cc.isalnum:
-            content = cc
-            while True:
-                cc = self.eat()
-                if cc.isalnum():
-                    content = content + cc
-                else:
-                    self.putback()
-                    break
-            return Token(TOKEN_IDENTIFIER, content)
+                raise LexError(f"Unexpected character {text!r}", source, pos)
+        yield Token(TOKEN_EOF, "-EOF-", len(source))
 
-        else:
-            return Token(TOKEN_EOF, None)
+    def nextToken(self):
+        return next(self.tokenstream, None) or Token(TOKEN_EOF, "-EOF-", len(self.source))
 # -------------------------------------------------------------------
 
 # class Expression
 
 
+class Scope:
+    """
+    The names a compiled expression can see: the parameters of the
+    functions around it, innermost first, and then the global dict.
+
+    At run time every call has a frame, a list of the argument values
+    followed by the frame the function was made in, so a parameter is
+    found by following parent links a fixed number of times and reading a
+    fixed slot. The top level has no frame.
+    """
+
+    def __init__(self, globals: Dict, params=(), parent=None):
+        self.globals = globals
+        self.params = list(params)
+        self.parent = parent
+        # whether code in here reads parameters of the functions around it
+        self.captures = False
+
+    def resolve(self, name: str):
+        "(links, slot) of a parameter, None for a global."
+        scope, passed = self, []
+        while scope.parent is not None:
+            if name in scope.params:
+                for inner in passed:
+                    inner.captures = True
+                # the last of the same name wins, like it did in a dict
+                return [len(inner.params) for inner in passed], \
+                    max(i for i, param in enumerate(scope.params) if param == name)
+            passed.append(scope)
+            scope = scope.parent
+        return None
+
+
+def variable(name: str, scope: Scope):
+    "A function of the frame that reads the variable name."
+    found = scope.resolve(name)
+    if found is None:
+        globals = scope.globals
+        return lambda frame: globals[name]
+    links, slot = found
+    if not links:
+        return operator.itemgetter(slot)
+
+    def lookup(frame):
+        for link in links:
+            frame = frame[link]
+        return frame[slot]
+    return lookup
+
+
+def path(name: str, scope: Scope) -> str:
+    "Python source that reads the variable name, see variable."
+    found = scope.resolve(name)
+    if found is None:
+        return f"G[{name!r}]"
+    links, slot = found
+    return "frame" + "".join(f"[{link}]" for link in links) + f"[{slot}]"
+
+
+class Source:
+    """
+    Python source of a function body being fused, see fuse, and the
+    values its names stand for.
+    """
+
+    def __init__(self, globals: Dict):
+        self.names = {"G": globals, "_call": call, "_defer": defer, "_eq": equal}
+
+    def value(self, val) -> str:
+        "A name for val in the source."
+        name = f"_v{len(self.names)}"
+        self.names[name] = val
+        return name
+
+
 class Expression():
     def eval(self, environment: Dict):
         pass
 
+    def compile(self, scope: Scope):
+        """
+        A function of the frame that evaluates the expression like eval
+        does. The tree is walked and the names are resolved once here, the
+        returned closures only do the work.
+        """
+        globals = scope.globals
+        return lambda frame: self.eval(globals)
+
+    def compile_tail(self, scope: Scope):
+        """
+        Like compile, for an expression whose value is the value of the
+        function it is in. Calls there return a TailCall instead of growing
+        the stack.
+        """
+        return self.compile(scope)
+
+    def source(self, scope: Scope, out: Source, tail=False) -> str:
+        """
+        A Python expression of frame that evaluates the expression like
+        compile does, for fuse. Expressions without one of their own run
+        their compiled closure.
+        """
+        return out.value(compile_expression(self, scope, tail)) + "(frame)"
+
+    def calls(self) -> bool:
+        "Whether evaluating the expression may call a lambada function."
+        return False
+
+    def compile_gen(self, scope: Scope):
+        """
+        A generator function of the frame for expressions that call lambada
+        functions, driven by run(). It yields the generators of its
+        subexpressions that make calls and is sent their values, so deep
+        recursion grows the list in run() instead of the Python stack.
+        """
+        code = self.compile(scope)
+
+        def gen(frame):
+            return code(frame)
+            yield
+        return gen
+
+
+def compile_expression(expr, scope: Scope, tail=False):
+    if expr is None:
+        return lambda frame: None
+    return expr.compile_tail(scope) if tail else expr.compile(scope)
+
+
+def fuse(expr, scope: Scope):
+    """
+    compile_expression(expr, scope, tail=True) as a single Python function
+    instead of a closure per subexpression, for the bodies of functions,
+    where a program spends its time. Bodies nested too deep for the Python
+    compiler are left as closures.
+    """
+    if expr is None:
+        return lambda frame: None
+    out = Source(scope.globals)
+    try:
+        code = compile("lambda frame: " + expr.source(scope, out, tail=True), "<lambada>", "eval")
+    except (SyntaxError, RecursionError, MemoryError):
+        return compile_expression(expr, scope, tail=True)
+    return eval(code, out.names)
+
+
+def makes_calls(expr) -> bool:
+    return expr is not None and expr.calls()
+
+
+def compile_part(expr, scope: Scope):
+    """
+    (generator function, None) for an expression that makes calls and
+    (None, closure) for one that does not, which is evaluated in place.
+    """
+    if makes_calls(expr):
+        return expr.compile_gen(scope), None
+    return None, compile_expression(expr, scope)
+
+
+class TailCall:
+    "A call left to the caller, so a tail call does not nest."
+    __slots__ = ("fn", "frame")
+
+    def __init__(self, fn, frame):
+        self.fn = fn
+        self.frame = frame
+
+
+class Goto:
+    "Tells run() to continue with gen in place of the generator that returned it."
+    __slots__ = ("gen",)
+
+    def __init__(self, gen):
+        self.gen = gen
+
+
+# lambada calls nested on the Python stack before run() takes over
+MAX_DEPTH = 50
+# calls a program may make, tail calls included, so an endless recursion
+# ends with an error instead of holding the interpreter forever
+MAX_CALLS = 2 * 10 ** 6
+# generators on the explicit stack of run(), about two per nested call and
+# 200 bytes each, so around 50MB at most
+MAX_STACK = 250000
+
+
+class _State:
+    "Counters of the program that is running."
+    __slots__ = ("depth", "left")
+
+    def __init__(self):
+        self.depth = 0
+        self.left = MAX_CALLS
+
+
+# one program runs at a time, they are CPU bound anyway, so the counters
+# are plain attributes instead of thread locals
+_lock = threading.RLock()
+_state = _State()
+# a TailCall is taken apart right after it is returned, so one is reused
+# instead of making one per tail call
+_tail = TailCall(None, None)
+
+
+def tail_call(fn, frame) -> TailCall:
+    tail = _tail
+    tail.fn = fn
+    tail.frame = frame
+    return tail
+
+
+def execute(program: list, max_calls: int = MAX_CALLS):
+    "Runs the compiled expressions of a program, the value of the last."
+    with _lock:
+        state = _state
+        # an error ends the whole program, the counters start over here
+        state.depth = 0
+        state.left = max_calls
+        result = None
+        for expr in program:
+            result = expr(None)
+        return result
+
+
+def call_limit():
+    return CallLimit("too many calls, is there an endless recursion?")
+
+
+def call(closure, values: list):
+    """
+    Calls closure with the argument values: tail calls are looped over, past
+    MAX_DEPTH nested calls the rest runs on the explicit stack of run().
+    """
+    fn = closure.fn
+    if len(values) != fn.arity:
+        raise arity_error(fn, len(values))
+    values.append(closure.frame)
+    state = _state
+    if state.depth >= MAX_DEPTH:
+        return run(tail_call(fn, values))
+    state.depth += 1
+    result = fn.code(values)
+    while type(result) is TailCall:
+        state.left -= 1
+        if state.left < 0:
+            raise call_limit()
+        result = result.fn.code(result.frame)
+    state.depth -= 1
+    state.left -= 1
+    if state.left < 0:
+        raise call_limit()
+    return result
+
+
+def defer(closure, values: list) -> TailCall:
+    "call for a call in tail position, which is left to the caller."
+    fn = closure.fn
+    if len(values) != fn.arity:
+        raise arity_error(fn, len(values))
+    values.append(closure.frame)
+    return tail_call(fn, values)
+
+
+def run(value):
+    """
+    Evaluates a TailCall with a list of generators as the call stack. A
+    generator yields a generator whose value it needs, and returns its
+    own value, or a TailCall or Goto that takes its place on the stack.
+    """
+    state = _state
+    stack = []
+    while True:
+        if type(value) is TailCall:
+            state.left -= 1
+            if state.left < 0:
+                raise call_limit()
+            if len(stack) >= MAX_STACK:
+                raise CallLimit(f"calls nested more than {MAX_STACK} deep")
+            fn, frame = value.fn, value.frame
+            body = fn.compiled_gen()
+            if body is None:
+                value = fn.code(frame)
+                continue
+            stack.append(body(frame))
+            value = None
+        elif type(value) is Goto:
+            stack.append(value.gen)
+            value = None
+        elif not stack:
+            return value
+        try:
+            request = stack[-1].send(value)
+        except StopIteration as stop:
+            stack.pop()
+            value = stop.value
+            continue
+        stack.append(request)
+        value = None
+
 
 class NumberExpression(Expression):
     def __init__(self, val):
@@ -132,6 +444,13 @@ class NumberExpression(Expression):
     def eval(self, environment: Dict):
         return self.val
 
+    def compile(self, scope: Scope):
+        val = self.val
+        return lambda frame: val
+
+    def source(self, scope: Scope, out: Source, tail=False):
+        return repr(self.val) if type(self.val) is int else out.value(self.val)
+
 
 class StringExpression(Expression):
     def __init__(self, val):
@@ -140,6 +459,34 @@ class StringExpression(Expression):
     def eval(self, environment: Dict):
         return self.val
 
+    def compile(self, scope: Scope):
+        val = self.val
+        return lambda frame: val
+
+    def source(self, scope: Scope, out: Source, tail=False):
+        return out.value(self.val)
+
+
+def equal(a, b) -> bool:
+    "= compares whole values, vectors too, not element by element."
+    if isinstance(a, (int, float, str)) and isinstance(b, (int, float, str)):
+        return a == b
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return bool(np.array_equal(a, b))
+    return a == b
+
+
+OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "^": operator.pow,
+    "=": equal,
+}
+# the Python operator of each one but =, for fused code
+PYTHON_OPERATORS = {"+": "+", "-": "-", "*": "*", "/": "/", "^": "**"}
+
 
 class BinaryOperatorExpression(Expression):
     def __init__(self, op: str, left: Expression, right: Expression):
@@ -159,10 +506,89 @@ class BinaryOperatorExpression(Expression):
         elif self.op == "^":
             return self.left.eval(env) ** self.right.eval(env)
         elif self.op == "=":
-            return self.left.eval(env) == self.right.eval(env)
+            return equal(self.left.eval(env), self.right.eval(env))
         else:
             return ErrorExpression(f"Operator not defined yet: {self.op}")
 
+    def compile(self, scope: Scope):
+        op = OPERATORS.get(self.op)
+        if op is None:
+            error = ErrorExpression(f"Operator not defined yet: {self.op}")
+            return lambda frame: error
+        # parameters of the function itself and constants are read in place
+        # instead of through closures of their own, e.g. (- n 1) is a single
+        # call
+        left, right = _slot(self.left, scope), _slot(self.right, scope)
+        leftval, rightval = isinstance(self.left, NumberExpression), isinstance(self.right, NumberExpression)
+        comparison = self.comparison(scope)
+        if comparison is not None:
+            slot, val = comparison
+
+            def test(frame):
+                x = frame[slot]
+                return x == val if type(x) is int or type(x) is float else equal(x, val)
+            return test
+        if left is not None and rightval:
+            val = self.right.val
+            return lambda frame: op(frame[left], val)
+        if leftval and right is not None:
+            val = self.left.val
+            return lambda frame: op(val, frame[right])
+        if left is not None and right is not None:
+            return lambda frame: op(frame[left], frame[right])
+        left = compile_expression(self.left, scope)
+        right = compile_expression(self.right, scope)
+        return lambda frame: op(left(frame), right(frame))
+
+    def comparison(self, scope: Scope):
+        """
+        (slot, number) for (= n 0) and (= 0 n) with n a parameter of the
+        innermost function, the test of most recursions, which is compiled
+        without a call of equal.
+        """
+        if self.op != "=":
+            return None
+        if isinstance(self.right, NumberExpression) and _slot(self.left, scope) is not None:
+            return _slot(self.left, scope), self.right.val
+        if isinstance(self.left, NumberExpression) and _slot(self.right, scope) is not None:
+            return _slot(self.right, scope), self.left.val
+        return None
+
+    def source(self, scope: Scope, out: Source, tail=False):
+        if self.op not in OPERATORS:
+            return super().source(scope, out)
+        left, right = self.left.source(scope, out), self.right.source(scope, out)
+        if self.op != "=":
+            return f"({left} {PYTHON_OPERATORS[self.op]} {right})"
+        comparison = self.comparison(scope)
+        if comparison is None:
+            return f"_eq({left}, {right})"
+        x, val = f"frame[{comparison[0]}]", out.value(comparison[1])
+        return f"({x} == {val} if type({x}) is int or type({x}) is float else _eq({x}, {val}))"
+
+    def calls(self):
+        return self.op in OPERATORS and (makes_calls(self.left) or makes_calls(self.right))
+
+    def compile_gen(self, scope: Scope):
+        op = OPERATORS[self.op]
+        leftgen, left = compile_part(self.left, scope)
+        rightgen, right = compile_part(self.right, scope)
+
+        def gen(frame):
+            a = (yield leftgen(frame)) if leftgen else left(frame)
+            b = (yield rightgen(frame)) if rightgen else right(frame)
+            return op(a, b)
+        return gen
+
+
+def _slot(expr, scope: Scope):
+    "The slot of expr when it is a parameter of the innermost function, else None."
+    if isinstance(expr, IdentifierExpression):
+        found = scope.resolve(expr.id)
+        if found is not None and not found[0]:
+            return found[1]
+    return None
+
 
 class ErrorExpression(Expression):
     def __init__(self, msg):
@@ -179,8 +605,16 @@ class IdentifierExpression(Expression):
     def eval(self, env: Dict):
         return env[self.id]
 
+    def compile(self, scope: Scope):
+        return variable(self.id, scope)
+
+    def source(self, scope: Scope, out: Source, tail=False):
+        return path(self.id, scope)
+
 
 class DefExpression(Expression):
+    "Binds a global, also when it is inside a function."
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
@@ -190,13 +624,77 @@ class DefExpression(Expression):
         env[self.left.id] = val
         return val
 
+    def compile(self, scope: Scope):
+        globals, id = scope.globals, self.left.id
+        right = compile_expression(self.right, scope)
+
+        def define(frame):
+            val = globals[id] = right(frame)
+            return val
+        return define
+
+    def calls(self):
+        return makes_calls(self.right)
+
+    def compile_gen(self, scope: Scope):
+        globals, id = scope.globals, self.left.id
+        right = self.right.compile_gen(scope)
+
+        def gen(frame):
+            val = globals[id] = yield right(frame)
+            return val
+        return gen
+
+
+def vector(values: list):
+    """
+    values as a NumPy array when they are all numbers, so arithmetic on it
+    is elementwise and runs at NumPy speed, else the list itself.
+    """
+    if not values:
+        return values
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, float, np.number)):
+            return values
+    try:
+        array = np.array(values)
+    except OverflowError:
+        return values
+    # integers too big for int64 give an array of objects
+    return array if array.dtype.kind in "iuf" else values
+
 
 class ListExpression(Expression):
+    "A list, or a vector when all its elements are numbers."
+
     def __init__(self, listcontent: [Expression]):
         self.listcontent = listcontent
 
     def eval(self, env: Dict):
-        return [elem.eval(env) for elem in self.listcontent]
+        return vector([elem.eval(env) for elem in self.listcontent])
+
+    def compile(self, scope: Scope):
+        if self.listcontent and all(isinstance(elem, NumberExpression) for elem in self.listcontent):
+            # a literal is made once, read-only as every evaluation shares it
+            array = vector([elem.val for elem in self.listcontent])
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+            return lambda frame: array
+        elems = [compile_expression(elem, scope) for elem in self.listcontent]
+        return lambda frame: vector([elem(frame) for elem in elems])
+
+    def calls(self):
+        return any(makes_calls(elem) for elem in self.listcontent)
+
+    def compile_gen(self, scope: Scope):
+        parts = [compile_part(elem, scope) for elem in self.listcontent]
+
+        def gen(frame):
+            values = []
+            for elemgen, elem in parts:
+                values.append((yield elemgen(frame)) if elemgen else elem(frame))
+            return vector(values)
+        return gen
 
 
 class LengthExpression(Expression):
@@ -206,6 +704,20 @@ class LengthExpression(Expression):
     def eval(self, env: Dict):
         return len(self.listExpr.eval(env))
 
+    def compile(self, scope: Scope):
+        listExpr = compile_expression(self.listExpr, scope)
+        return lambda frame: len(listExpr(frame))
+
+    def calls(self):
+        return makes_calls(self.listExpr)
+
+    def compile_gen(self, scope: Scope):
+        listExpr = self.listExpr.compile_gen(scope)
+
+        def gen(frame):
+            return len((yield listExpr(frame)))
+        return gen
+
 
 class DumpExpression(Expression):
     def eval(self, env: Dict):
@@ -216,9 +728,48 @@ class FunctionExpression(Expression):
     def __init__(self, paramlist: ListExpression, body: Expression):
         self.paramlist = paramlist
         self.body = body
+        self.params = [param.id for param in getattr(paramlist, "listcontent", [])]
 
     def eval(self, env: Dict):
-        return self
+        return execute([self.compile(Scope(env))])
+
+    def compile(self, scope: Scope):
+        fn = Lambda(self, scope)
+        if not fn.scope.captures:
+            # the frame it is made in is never read, one closure does
+            closure = Closure(fn, None)
+            return lambda frame: closure
+        return lambda frame: Closure(fn, frame)
+
+
+class Lambda:
+    "A compiled fn expression."
+
+    def __init__(self, func: FunctionExpression, scope: Scope):
+        self.arity = len(func.params)
+        self.body = func.body
+        self.scope = Scope(scope.globals, func.params, scope)
+        self.code = fuse(func.body, self.scope)
+        self.gen = None
+
+    def compiled_gen(self):
+        "The generator function of the body for run(), None when it makes no calls."
+        if self.gen is None:
+            self.gen = compile_part(self.body, self.scope)[0] or False
+        return self.gen or None
+
+
+class Closure:
+    "The value of a fn expression: its Lambda and the frame it was made in."
+    __slots__ = ("fn", "frame")
+
+    def __init__(self, fn: Lambda, frame):
+        self.fn = fn
+        self.frame = frame
+
+
+def arity_error(fn: Lambda, count: int):
+    return TypeError(f"function of {fn.arity} arguments called with {count}")
 
 
 class PythonFunctionExpression(Expression):
@@ -235,12 +786,27 @@ class PythonFunctionCallExpression(Expression):
         self.args = args
 
     def eval(self, env: Dict):
-        fdict = dict(env)
         func: PythonFunctionExpression = env[self.fname.id]
         evaledList = self.args.eval(env)
         result = func.pyfunction(evaledList)
         return result
 
+    def compile(self, scope: Scope):
+        func = variable(self.fname.id, scope)
+        args = compile_expression(self.args, scope)
+        return lambda frame: func(frame).pyfunction(args(frame))
+
+    def calls(self):
+        return makes_calls(self.args)
+
+    def compile_gen(self, scope: Scope):
+        func = variable(self.fname.id, scope)
+        args = self.args.compile_gen(scope)
+
+        def gen(frame):
+            return func(frame).pyfunction((yield args(frame)))
+        return gen
+
 
 class FunctionCallExpression(Expression):
     def __init__(self, fname: IdentifierExpression, args: ListExpression):
@@ -248,13 +814,41 @@ class FunctionCallExpression(Expression):
         self.args = args
 
     def eval(self, env: Dict):
-        fdict = dict(env)
-        func: FunctionExpression = env[self.fname.id]
-        for i in range(0, len(func.paramlist.listcontent)):
-            fdict[func.paramlist.listcontent[i].id] = self.args.listcontent[i].eval(
-                fdict)
-        result = func.body.eval(fdict)
-        return result
+        return execute([self.compile(Scope(env))])
+
+    def compile(self, scope: Scope, tail=False):
+        # usually a name, but a call that returns a function works too
+        func = compile_expression(self.fname, scope)
+        args = [compile_expression(arg, scope) for arg in self.args.listcontent]
+        invoke = defer if tail else call
+        return lambda frame: invoke(func(frame), [arg(frame) for arg in args])
+
+    def source(self, scope: Scope, out: Source, tail=False):
+        func = self.fname.source(scope, out)
+        args = ", ".join(arg.source(scope, out) for arg in self.args.listcontent)
+        return f"{'_defer' if tail else '_call'}({func}, [{args}])"
+
+    def compile_tail(self, scope: Scope):
+        return self.compile(scope, tail=True)
+
+    def calls(self):
+        return True
+
+    def compile_gen(self, scope: Scope):
+        funcgen, func = compile_part(self.fname, scope)
+        args = [compile_part(arg, scope) for arg in self.args.listcontent]
+        count = len(args)
+
+        def gen(frame):
+            closure: Closure = (yield funcgen(frame)) if funcgen else func(frame)
+            if count != closure.fn.arity:
+                raise arity_error(closure.fn, count)
+            values = []
+            for arggen, arg in args:
+                values.append((yield arggen(frame)) if arggen else arg(frame))
+            values.append(closure.frame)
+            return tail_call(closure.fn, values)
+        return gen
 
 
 class IfElseExpression(Expression):
@@ -270,30 +864,65 @@ class IfElseExpression(Expression):
         else:
             return self.ifFalse.eval(env)
 
+    def compile(self, scope: Scope, tail=False):
+        cond = compile_expression(self.cond, scope)
+        ifTrue = compile_expression(self.ifTrue, scope, tail)
+        ifFalse = compile_expression(self.ifFalse, scope, tail)
+        comparison = self.cond.comparison(scope) if isinstance(self.cond, BinaryOperatorExpression) else None
+        if comparison is not None:
+            # the test is done here instead of in a closure of its own
+            slot, val = comparison
+
+            def branch(frame):
+                x = frame[slot]
+                if type(x) is int or type(x) is float:
+                    return ifTrue(frame) if x == val else ifFalse(frame)
+                return ifTrue(frame) if equal(x, val) else ifFalse(frame)
+            return branch
+        return lambda frame: ifTrue(frame) if cond(frame) else ifFalse(frame)
+
+    def compile_tail(self, scope: Scope):
+        return self.compile(scope, tail=True)
+
+    def source(self, scope: Scope, out: Source, tail=False):
+        cond = self.cond.source(scope, out) if self.cond is not None else "None"
+        ifTrue = self.ifTrue.source(scope, out, tail) if self.ifTrue is not None else "None"
+        ifFalse = self.ifFalse.source(scope, out, tail) if self.ifFalse is not None else "None"
+        return f"({ifTrue} if {cond} else {ifFalse})"
+
+    def calls(self):
+        return any(makes_calls(expr) for expr in (self.cond, self.ifTrue, self.ifFalse))
+
+    def compile_gen(self, scope: Scope):
+        condgen, cond = compile_part(self.cond, scope)
+        branches = compile_part(self.ifTrue, scope), compile_part(self.ifFalse, scope)
+
+        def gen(frame):
+            value = (yield condgen(frame)) if condgen else cond(frame)
+            branchgen, branch = branches[0] if value else branches[1]
+            if branchgen is None:
+                return branch(frame)
+            return Goto(branchgen(frame))
+        return gen
+
+
 # --------------------------------------------------------------------
 
 
 class Parser():
     def __init__(self, code):
+        self.code = code
+        # tokens are read as the parser needs them
         self.lexer = Lexer(code)
-        self.tokens = []
-        self.state = -1
-        while True:
-            tok = self.lexer.nextToken()
-            self.tokens.append(tok)
-            if tok.type == TOKEN_EOF:
-                break
 
     def getNextToken(self):
-        self.state = self.state + 1
-        if self.state > len(self.tokens) - 1:
-            return Token(TOKEN_EOF, None)
-        return self.tokens[self.state]
+        return self.lexer.nextToken()
 
     def eatRightParanth(self):
         token = self.getNextToken()
         if not (token.type == TOKEN_RIGHT_PARANT):
-            raise Exception(f"Right paranthesis expected but {token} found")
+            line, column = position(self.code, token.pos)
+            raise Exception(f"Right paranthesis expected but {token} found at line {line}, column {column}")
 
     def parseNextExpression(self):
         token = self.getNextToken()
@@ -386,27 +1015,63 @@ class Parser():
             return None
 
     def __str__(self):
-        return str([str(t) for t in self.tokens])
+        return str([str(t) for t in Lexer(self.code).tokens()])
 
 # ---------------------------------------------------------------------
 
 
+# compiled programs an Interpreter keeps, by source text, and their total
+# length; compiled code takes about 60 bytes per source character, so the
+# cache stays around 4MB
+CACHE_SIZE = 256
+CACHE_CHARS = 64 * 1024
+
+
 class Interpreter:
-    def __init__(self):
+    def __init__(self, cache_size: int = CACHE_SIZE, max_calls: int = MAX_CALLS,
+                 cache_chars: int = CACHE_CHARS):
         self.env = dict()
+        self.max_calls = max_calls
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_chars = cache_chars
+        self.cached_chars = 0
+        self.hits = 0
+        self.misses = 0
 
     def addvar(self, name, val):
         self.env[name] = val
 
-    def interprete(self, code: str):
+    def compile(self, code: str) -> list:
+        """
+        The compiled expressions of code. Programs that were run before
+        come from an LRU cache and skip the lexer, parser and compiler.
+        """
+        program = self.cache.get(code)
+        if program is not None:
+            self.hits += 1
+            self.cache.move_to_end(code)
+            return program
+        self.misses += 1
         parser = Parser(code)
-        result: Expression = None
+        scope = Scope(self.env)
+        program = []
         while True:
             expr = parser.parseNextExpression()
             if expr == None:
                 break
-            result = expr.eval(self.env)
-        return result
+            program.append(expr.compile(scope))
+        if len(code) > self.cache_chars:
+            return program
+        self.cache[code] = program
+        self.cached_chars += len(code)
+        while len(self.cache) > self.cache_size or self.cached_chars > self.cache_chars:
+            old, _ = self.cache.popitem(last=False)
+            self.cached_chars -= len(old)
+        return program
+
+    def interprete(self, code: str):
+        return execute(self.compile(code), self.max_calls)
 
 
 #code = "(length (list 1 2 3 4 5 ))"
@@ -415,13 +1080,14 @@ class Interpreter:
 
 
 # REPL
-interpreter = Interpreter()
-code = """
-(def str "selam")
-(dump)
-"""
-interpreter.addvar("hako", PythonFunctionExpression("hako"))
-print(interpreter.interprete(code))
-# while True:
-#    inp = input("lambada> ")
-#    print(interpreter.interprete(inp))
+if __name__ == "__main__":
+    interpreter = Interpreter()
+    code = """
+    (def str "selam")
+    (dump)
+    """
+    interpreter.addvar("hako", PythonFunctionExpression("hako"))
+    print(interpreter.interprete(code))
+    # while True:
+    #    inp = input("lambada> ")
+    #    print(interpreter.interprete(inp))
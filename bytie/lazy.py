@@ -0,0 +1,63 @@
+import importlib
+import time
+
+# seconds spent importing each lazily loaded module
+import_times = {}
+_registered = []
+
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access, so heavy
+    dependencies are only paid for by the handlers that use them.
+    """
+
+    def __init__(self, name: str, package: str = None):
+        self.__dict__["_name"] = name
+        self.__dict__["_package"] = package
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self._name, self._package)
+            import_times[module.__name__] = time.perf_counter() - start
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def module(name: str, package: str = None) -> LazyModule:
+    lazy = LazyModule(name, package)
+    _registered.append(lazy)
+    return lazy
+
+
+def sibling(name: str, package: str = None) -> LazyModule:
+    "A lazy bytie module, imported the same way messagehandle imports its siblings."
+    if package:
+        return module("." + name, package)
+    return module(name)
+
+
+def warm_up() -> dict:
+    "Imports every registered module that is not loaded yet."
+    for lazy in _registered:
+        lazy._load()
+    return dict(import_times)
+
+
+def report() -> str:
+    lines = [f"{name}: {seconds * 1000:.0f} ms"
+             for name, seconds in sorted(import_times.items(), key=lambda item: -item[1])]
+    return "\n".join(lines)
@@ -1,9 +1,15 @@
 from typing import Dict, List
 
-import numpy
 import random
 import os
-import matplotlib.pyplot as plt
+
+try:
+    import lazy
+except Exception:
+    from . import lazy
+
+numpy = lazy.module("numpy")
+plt = lazy.module("matplotlib.pyplot")
 
 
 try:
@@ -14,9 +20,16 @@ except KeyError:
     PATH = "/tmp"
 
     
-sum = numpy.sum
-mean = numpy.mean
-median = numpy.median
+def sum(args: List):
+    return numpy.sum(args)
+
+
+def mean(args: List):
+    return numpy.mean(args)
+
+
+def median(args: List):
+    return numpy.median(args)
 
 
 def quantile(args: List) -> str:
@@ -25,9 +38,10 @@ def quantile(args: List) -> str:
     return str(numpy.quantile(nums, q))
 
 
-def draw_random_numbers(args: List) -> str:
-    n = args[0]
-    return str([random.random() for i in range(n)])
+def draw_random_numbers(args: List):
+    "A vector of n uniform random numbers in [0, 1)."
+    n = int(args[0])
+    return numpy.random.random(n)
 
 
 def plot(nums: List) -> str:
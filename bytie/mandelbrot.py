@@ -1,88 +1,651 @@
-import numpy as np
-import matplotlib.pyplot as plt
-from PIL import Image
-
-canvas_shape = (600, 600)
-
-
-def mandel_iter(canvas, max_iter, divergence_radius):
-
-    real_c, cmplx_c = canvas
-    real_z, cmplx_z = np.zeros(canvas_shape, dtype="float64"), np.zeros(
-        canvas_shape, dtype="float64"
-    )
-
-    iter_array = np.zeros(canvas_shape, dtype="uint8")
-    done_mask = np.zeros(canvas_shape, dtype="uint8")
-
-    for idx in range(max_iter):
-
-        # (a + bi) ** 2
-
-        # a**2 - b**2
-        # 2 * a * b
-
-        real_z, cmplx_z = (
-            real_z ** 2 - cmplx_z ** 2 + real_c,
-            2 * real_z * cmplx_z + cmplx_c,
-        )
-
-        dists = real_z ** 2 + cmplx_z ** 2
-
-        done_mask[dists >= divergence_radius] = 1
-        # done_mask = done_mask | (dists >= divergence_radius)
-
-        real_z[done_mask == 1] = 0
-        cmplx_z[done_mask == 1] = 0
-
-        iter_array[done_mask != 1] = idx
-
-        if np.sum(done_mask == 0) == 0:
-            break
-
-    return iter_array
-
-
-def mandelbrot(zoom=0.5, center=(0, 0), filename="deneme.png", max_iter=200, div_radius=4):
-    _extents = 2 / (2 ** zoom)
-
-    x_lim = [center[0] - _extents, center[0] + _extents]
-    y_lim = [center[1] - _extents, center[1] + _extents]
-
-    x_range = np.linspace(x_lim[0], x_lim[1], canvas_shape[1], dtype="float64").reshape(
-        1, canvas_shape[1]
-    )
-    canvas_real = np.repeat(x_range, canvas_shape[0], axis=0)
-    y_range = np.linspace(y_lim[0], y_lim[1], canvas_shape[0], dtype="float64").reshape(
-        canvas_shape[0], 1
-    )
-    canvas_cmplx = np.repeat(y_range[::-1, :], canvas_shape[1], axis=1)
-
-    res = mandel_iter((canvas_real, canvas_cmplx), max_iter, div_radius)
-
-    plt.imshow(res)
-    plt.set_cmap("hot")
-    plt.axis("off")
-    plt.savefig(filename, bbox_inches="tight")
-
-
-"""
-BYTIE REPO : https://github.com/jbytecode/bytie
-
-
-1 - mandelbrot çizdir : mrgranddy
-
-2 - parametre alıp zoomdur/scale 
-    yaparak çizdir
-
-2.5 - opsiyonel: 
-      eğer ilginç bölgeleri bulmanın 
-      bir yolu varsa onu bul
-
-3 - bunun bi apisini yap
-
-4 - bytie'ye bağla
-
-
-
-"""
+import io
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from decimal import Decimal, localcontext
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image
+
+canvas_shape = (600, 600)
+# side of the square tiles handed to the worker processes
+tile_size = 48
+
+# worker count -> process pool; a render never shuts down a pool that
+# another render with a different worker count is still using
+_pools = {}
+_pool_lock = threading.Lock()
+
+METHODS = ("escape", "mariani")
+# above this zoom neighbouring pixels are too close for float64 coordinates
+DEEP_ZOOM = 40
+# the cycle check of periodicity runs every PERIODICITY_EVERY iterations
+# from PERIODICITY_AFTER on; most points escape before, and the ones that
+# stay are caught a few iterations later at an eighth of the cost
+PERIODICITY_EVERY = 8
+PERIODICITY_AFTER = 32
+# the largest view a request may ask for; the reference orbit of a deep zoom
+# needs zoom * 0.3 digits, and perturb keeps the pixel offsets in float64,
+# which underflows past 2 ** -1022 anyway
+MAX_ZOOM = 1000
+MAX_ITER = 100000
+
+
+def check_view(zoom, max_iter, div_radius):
+    "Raises ValueError for a view outside the bounds a request may ask for."
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError(f"zoom must be between 0 and {MAX_ZOOM}")
+    if not 1 <= max_iter <= MAX_ITER:
+        raise ValueError(f"iterations must be between 1 and {MAX_ITER}")
+    if not (math.isfinite(div_radius) and div_radius > 0):
+        raise ValueError("divergence radius must be a positive number")
+
+
+def in_main_bulbs(real, cmplx):
+    "True for points inside the main cardioid or the period-2 bulb, which never escape."
+    x = real - 0.25
+    y2 = cmplx * cmplx
+    q = x * x + y2
+    cardioid = q * (q + x) <= 0.25 * y2
+    bulb = (real + 1) ** 2 + y2 <= 0.0625
+    return cardioid | bulb
+
+
+def mandel_iter(canvas, max_iter, divergence_radius, dtype=np.complex128, compact_every=4,
+                interior_check=False, periodicity=False, smooth=False):
+    """
+    Escape time of every point of canvas = (real parts, imaginary parts).
+
+    A point that escapes (|z|**2 >= divergence_radius) at iteration idx gets
+    max(idx - 1, 0), a point that never escapes gets max_iter - 1. Only the
+    points that have not escaped yet are iterated: they are compacted into
+    smaller arrays every compact_every iterations and updated in place.
+    dtype=np.complex64 is faster and good enough for shallow zooms.
+
+    interior_check skips the points of the main cardioid and the period-2
+    bulb; it is ignored for a divergence_radius under 4, where points of
+    the set can count as escaped. periodicity stops iterating a point once
+    its orbit comes back to a value it had before (Brent's cycle detection),
+    so the inside of other bulbs does not run to max_iter either. It only
+    pays off for views with a lot of such bulbs.
+
+    With smooth the result is float32 and an escaping point gets a fraction
+    taken from how far past the radius it jumped, which removes the colour
+    bands of the integer counts.
+    """
+    real_c, cmplx_c = canvas
+    shape = np.shape(real_c)
+
+    c = np.empty(shape, dtype=dtype)
+    c.real = real_c
+    c.imag = cmplx_c
+    c = c.ravel()
+    real_type = c.real.dtype.type
+    radius = real_type(divergence_radius)
+    # squared distance under which two orbit points count as the same
+    tolerance = real_type(1e-20 if real_type == np.float64 else 1e-10)
+
+    iter_array = np.full(c.size, max(max_iter - 1, 0), dtype=np.float32 if smooth else np.int32)
+    log_radius = np.log(max(divergence_radius, 1.0 + 1e-9))
+    index = np.arange(c.size)
+    # the bulbs never leave |z| <= 2, a smaller radius lets them escape
+    if interior_check and divergence_radius >= 4:
+        outside = ~in_main_bulbs(c.real, c.imag)
+        index = index[outside]
+        c = c[outside]
+
+    def buffers(n):
+        return (np.ones(n, dtype=bool), np.empty(n, dtype=c.real.dtype),
+                np.empty(n, dtype=c.real.dtype), np.empty(n, dtype=bool))
+
+    z = np.zeros_like(c)
+    alive, dists, tmp, escaped = buffers(c.size)
+    saved = np.zeros_like(c) if periodicity else None
+    diff = np.empty_like(c) if periodicity else None
+    next_save = 1
+    dirty = False
+
+    for idx in range(max_iter if index.size else 0):
+        np.multiply(z, z, out=z)
+        np.add(z, c, out=z)
+
+        np.multiply(z.real, z.real, out=dists)
+        np.multiply(z.imag, z.imag, out=tmp)
+        np.add(dists, tmp, out=dists)
+        np.greater_equal(dists, radius, out=escaped)
+        np.logical_and(escaped, alive, out=escaped)
+
+        if escaped.any():
+            if smooth:
+                # log2(log|z|**2 / log radius) is 0 when |z|**2 just reached the radius
+                jump = np.log2(np.log(dists[escaped].astype(np.float64)) / log_radius)
+                iter_array[index[escaped]] = np.maximum(idx - np.clip(jump, 0, 1), 0)
+            else:
+                iter_array[index[escaped]] = max(idx - 1, 0)
+            np.logical_xor(alive, escaped, out=alive)
+            # escaped points stay in the arrays until the next compaction,
+            # keep them from overflowing
+            z[escaped] = 0
+            dirty = True
+
+        if periodicity:
+            if idx + 1 == next_save:
+                saved[...] = z
+                next_save *= 2
+            elif idx >= PERIODICITY_AFTER and (idx + 1) % PERIODICITY_EVERY == 0:
+                np.subtract(z, saved, out=diff)
+                np.multiply(diff.real, diff.real, out=dists)
+                np.multiply(diff.imag, diff.imag, out=tmp)
+                np.add(dists, tmp, out=dists)
+                np.less(dists, tolerance, out=escaped)
+                np.logical_and(escaped, alive, out=escaped)
+                if escaped.any():
+                    # a cycle: the point is in the set and keeps max_iter - 1
+                    np.logical_xor(alive, escaped, out=alive)
+                    dirty = True
+
+        if dirty and (idx + 1) % compact_every == 0:
+            index = index[alive]
+            if index.size == 0:
+                break
+            z = z[alive]
+            c = c[alive]
+            if periodicity:
+                saved = saved[alive]
+                diff = np.empty_like(c)
+            alive, dists, tmp, escaped = buffers(index.size)
+            dirty = False
+
+    return iter_array.reshape(shape)
+
+
+def mariani_silver(x_range, y_range, max_iter, div_radius, dtype=np.complex128, min_size=8, **options):
+    """
+    mandel_iter over the grid x_range * y_range by rectangle subdivision: the
+    border of a rectangle is computed first and if every border pixel has the
+    same value the inside is filled with it, otherwise the rectangle is split
+    in four. The set is connected, so a uniform border can not hide anything
+    different inside. options are passed on to mandel_iter.
+    """
+    height, width = len(y_range), len(x_range)
+    out = np.full((height, width), -1, dtype=result_dtype(options))
+
+    def compute(rows, cols):
+        todo = out[rows, cols] < 0
+        if todo.any():
+            r, c = rows[todo], cols[todo]
+            out[r, c] = mandel_iter((x_range[c], y_range[r]), max_iter, div_radius,
+                                    dtype=dtype, **options)
+        return out[rows, cols]
+
+    # one subdivision level at a time, so the kernel runs on all the borders
+    # of a level at once instead of on many tiny arrays
+    rects = [(0, height, 0, width)]
+    small = []
+    while rects:
+        large = []
+        for rect in rects:
+            r0, r1, c0, c1 = rect
+            (small if r1 - r0 <= min_size or c1 - c0 <= min_size else large).append(rect)
+        if not large:
+            break
+
+        borders = []
+        for r0, r1, c0, c1 in large:
+            span_r = np.arange(r0, r1)
+            span_c = np.arange(c0, c1)
+            borders.append((np.concatenate([np.full(c1 - c0, r0), np.full(c1 - c0, r1 - 1), span_r, span_r]),
+                            np.concatenate([span_c, span_c, np.full(r1 - r0, c0), np.full(r1 - r0, c1 - 1)])))
+        compute(np.concatenate([b[0] for b in borders]), np.concatenate([b[1] for b in borders]))
+
+        rects = []
+        for (r0, r1, c0, c1), (rows, cols) in zip(large, borders):
+            border = out[rows, cols]
+            if (border == border[0]).all():
+                out[r0 + 1:r1 - 1, c0 + 1:c1 - 1] = border[0]
+                continue
+            rm = (r0 + r1) // 2
+            cm = (c0 + c1) // 2
+            rects.extend([(r0, rm, c0, cm), (r0, rm, cm, c1), (rm, r1, c0, cm), (rm, r1, cm, c1)])
+
+    if small:
+        cells = [np.mgrid[r0:r1, c0:c1].reshape(2, -1) for r0, r1, c0, c1 in small]
+        compute(*np.concatenate(cells, axis=1))
+
+    return out
+
+
+def result_dtype(options):
+    "dtype of the escape times mandel_iter returns with these options."
+    return np.float32 if options.get("smooth") else np.int32
+
+
+def render_grid(x_range, y_range, max_iter, div_radius, dtype=np.complex128, method="escape", **options):
+    """
+    Escape times of the grid x_range * y_range with one of the METHODS,
+    options (interior_check, periodicity, ...) are passed on to mandel_iter.
+    """
+    if method == "mariani":
+        return mariani_silver(x_range, y_range, max_iter, div_radius, dtype=dtype, **options)
+    if method != "escape":
+        raise ValueError(f"unknown method {method!r}, use one of {METHODS}")
+    return mandel_iter(np.meshgrid(x_range, y_range), max_iter, div_radius, dtype=dtype, **options)
+
+
+def _tile_worker(shm_name, shape, rows, cols, x_range, y_range, max_iter, div_radius, dtype, options):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=result_dtype(options), buffer=shm.buf)
+        out[rows[0]:rows[1], cols[0]:cols[1]] = render_grid(
+            x_range[cols[0]:cols[1]], y_range[rows[0]:rows[1]], max_iter, div_radius,
+            dtype=dtype, **options)
+    finally:
+        shm.close()
+
+
+def get_pool(workers):
+    with _pool_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            # forking the threaded bot process can copy held locks into the
+            # workers, so they are started from a clean fork server
+            pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("forkserver"))
+            _pools[workers] = pool
+        return pool
+
+
+@contextmanager
+def worker_pool(workers):
+    "get_pool(workers) for one render; a pool that broke in it is replaced by the next one."
+    pool = get_pool(workers)
+    try:
+        yield pool
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pools.get(workers) is pool:
+                del _pools[workers]
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+
+
+def render_tiled(x_range, y_range, max_iter, div_radius, dtype=np.complex128, workers=None, tile=None,
+                 **options):
+    """
+    render_grid over the grid x_range * y_range, split into tiles that a
+    process pool computes straight into a shared memory buffer. The tiles are
+    small and handed out one at a time, so the workers that get cheap tiles
+    far from the set keep taking new ones while others are busy with tiles on
+    the boundary.
+    """
+    tile = tile or tile_size
+    shape = (len(y_range), len(x_range))
+    dtype_out = result_dtype(options)
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * np.dtype(dtype_out).itemsize)
+    try:
+        with worker_pool(workers or os.cpu_count() or 1) as pool:
+            futures = [
+                pool.submit(_tile_worker, shm.name, shape,
+                            (r, min(r + tile, shape[0])), (c, min(c + tile, shape[1])),
+                            x_range, y_range, max_iter, div_radius, dtype, options)
+                for r in range(0, shape[0], tile)
+                for c in range(0, shape[1], tile)
+            ]
+            for future in futures:
+                future.result()
+        return np.ndarray(shape, dtype=dtype_out, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def reference_orbit(center, zoom, max_iter, div_radius):
+    """
+    Orbit Z_0 = 0, Z_1, ... of the center point, computed with Decimal at a
+    precision that resolves the pixels of the zoom, until it escapes or
+    reaches max_iter. The orbit itself stays near the set, so complex128 is
+    enough to store it.
+    """
+    digits = int(zoom * math.log10(2)) + 20
+    orbit = [0j]
+    with localcontext() as ctx:
+        ctx.prec = digits
+        cr, ci = Decimal(center[0]), Decimal(center[1])
+        zr = zi = Decimal(0)
+        radius = Decimal(div_radius)
+        for _ in range(max_iter):
+            zr, zi = zr * zr - zi * zi + cr, 2 * zr * zi + ci
+            orbit.append(complex(float(zr), float(zi)))
+            if zr * zr + zi * zi >= radius:
+                break
+    return np.array(orbit)
+
+
+def perturb(orbit, dc, max_iter, div_radius, smooth=False, compact_every=4):
+    """
+    Escape times of the points reference + dc, given the orbit of the
+    reference. Every point iterates only its float64 distance dz to the
+    reference orbit Z_n:
+
+        dz_(n+1) = 2 * Z_n * dz_n + dz_n**2 + dc
+
+    Where the reference goes wrong for a point (a glitch: |Z_n + dz_n| gets
+    smaller than |dz_n|, or the reference orbit ends), the point is rebased
+    on the start of the orbit with dz = Z_n + dz_n. The escape times follow
+    mandel_iter.
+    """
+    last = len(orbit) - 1
+    radius = float(div_radius)
+    log_radius = np.log(max(radius, 1.0 + 1e-9))
+
+    iter_array = np.full(dc.size, max(max_iter - 1, 0), dtype=np.float32 if smooth else np.int32)
+    index = np.arange(dc.size)
+    dz = np.zeros_like(dc)
+    ref = np.zeros(dc.size, dtype=np.intp)
+    alive = np.ones(dc.size, dtype=bool)
+    dirty = False
+
+    for idx in range(max_iter):
+        dz = (2 * orbit[ref] + dz) * dz + dc
+        ref += 1
+        z = orbit[ref] + dz
+
+        dists = z.real * z.real + z.imag * z.imag
+        escaped = (dists >= radius) & alive
+        if escaped.any():
+            if smooth:
+                jump = np.log2(np.log(dists[escaped]) / log_radius)
+                iter_array[index[escaped]] = np.maximum(idx - np.clip(jump, 0, 1), 0)
+            else:
+                iter_array[index[escaped]] = max(idx - 1, 0)
+            alive ^= escaped
+            # escaped points stay until the next compaction, keep them finite
+            z[escaped] = 0
+            dz[escaped] = 0
+            dirty = True
+
+        # rebase glitched pixels and the ones at the end of the reference
+        glitched = (dists < dz.real * dz.real + dz.imag * dz.imag) | (ref == last)
+        if glitched.any():
+            dz[glitched] = z[glitched]
+            ref[glitched] = 0
+
+        if dirty and (idx + 1) % compact_every == 0:
+            index, dz, dc, ref = index[alive], dz[alive], dc[alive], ref[alive]
+            if index.size == 0:
+                break
+            alive = np.ones(index.size, dtype=bool)
+            dirty = False
+
+    return iter_array
+
+
+def perturbation(zoom, center, max_iter, div_radius, shape=None, smooth=False, workers=1, tile=None):
+    """
+    Escape times of a deep zoom view. center is a pair of decimal strings (or
+    Decimals) with as many digits as the zoom needs; one reference orbit is
+    computed at that precision and the pixels are perturbed from it in
+    float64, which keeps zooms in the hundreds exact. Bands of tile rows are
+    spread over the process pool when workers > 1.
+    """
+    shape = shape or canvas_shape
+    height, width = shape
+    orbit = reference_orbit(center, zoom, max_iter, div_radius)
+    extent = 2 / (2 ** zoom)
+    dc = (np.linspace(-extent, extent, width)[np.newaxis, :]
+          + 1j * np.linspace(extent, -extent, height)[:, np.newaxis])
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return perturb(orbit, dc.ravel(), max_iter, div_radius, smooth=smooth).reshape(shape)
+    tile = tile or tile_size
+    with worker_pool(workers) as pool:
+        futures = [pool.submit(perturb, orbit, dc[r:r + tile].ravel(), max_iter, div_radius, smooth)
+                   for r in range(0, height, tile)]
+        return np.concatenate([future.result() for future in futures]).reshape(shape)
+
+
+def hot_colormap(size=256):
+    "RGB lookup table of matplotlib's hot colormap: black, red, yellow, white."
+    x = np.linspace(0, 1, size)
+    red = np.clip(0.0416 + 0.9584 * x / 0.365079, 0, 1)
+    green = np.clip((x - 0.365079) / (0.746032 - 0.365079), 0, 1)
+    blue = np.clip((x - 0.746032) / (1 - 0.746032), 0, 1)
+    return np.round(np.stack([red, green, blue], axis=1) * 255).astype(np.uint8)
+
+
+HOT = hot_colormap()
+
+
+def color_index(res, lo=None, hi=None, size=256):
+    """
+    Escape times to colormap indices, lo and hi (by default the minimum and
+    maximum like imshow does) map to the first and the last colour.
+    """
+    lo = res.min() if lo is None else lo
+    hi = res.max() if hi is None else hi
+    scale = (size - 1) / (hi - lo) if hi > lo else 0
+    return np.clip((res - lo) * scale, 0, size - 1).astype(np.uint8 if size <= 256 else np.intp)
+
+
+def colorize(res, colormap=HOT, lo=None, hi=None):
+    "Escape times to an RGB image."
+    return colormap[color_index(res, lo, hi, len(colormap))]
+
+
+def encode_png(rgb, filename=None, compress_level=1):
+    """
+    PNG of an RGB array, written to filename or returned as bytes. The
+    escape time images compress well, a low compress_level is enough.
+    """
+    image = Image.fromarray(rgb, "RGB")
+    if filename is not None:
+        image.save(filename, "PNG", compress_level=compress_level)
+        return None
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def view_axes(zoom, center, shape=None):
+    "Real and imaginary coordinates of the pixel columns and rows, top row first."
+    shape = shape or canvas_shape
+    _extents = 2 / (2 ** zoom)
+
+    x_lim = [center[0] - _extents, center[0] + _extents]
+    y_lim = [center[1] - _extents, center[1] + _extents]
+
+    x_range = np.linspace(x_lim[0], x_lim[1], shape[1], dtype="float64")
+    y_range = np.linspace(y_lim[0], y_lim[1], shape[0], dtype="float64")[::-1]
+    return x_range, y_range
+
+
+def mandelbrot(zoom=0.5, center=(0, 0), filename="deneme.png", max_iter=200, div_radius=4,
+               dtype=np.complex128, workers=None, cache=None, method="escape",
+               interior_check=True, periodicity=False, shape=None, smooth=False, colormap=HOT):
+    """
+    Renders the view as a PNG of shape = (height, width) pixels, written to
+    filename or returned as bytes when filename is None. Beyond DEEP_ZOOM, or
+    with method="perturbation", the view is rendered by perturbation() and
+    center should be given as decimal strings with enough digits.
+    """
+    shape = shape or canvas_shape
+    workers = workers or os.cpu_count() or 1
+    if zoom > DEEP_ZOOM or method == "perturbation":
+        res = perturbation(zoom, center, max_iter, div_radius, shape=shape, smooth=smooth, workers=workers)
+        return encode_png(colorize(res, colormap), filename)
+
+    center = (float(center[0]), float(center[1]))
+    x_range, y_range = view_axes(zoom, center, shape)
+    options = dict(method=method, interior_check=interior_check, periodicity=periodicity, smooth=smooth)
+
+    if cache is not None:
+        # a tilecache.TileCache; the view is snapped to its pixel grid
+        res = cache.render(zoom, center, max_iter, div_radius, shape=shape, dtype=dtype, workers=workers,
+                           **options)
+    elif workers == 1:
+        res = render_grid(x_range, y_range, max_iter, div_radius, dtype=dtype, **options)
+    else:
+        res = render_tiled(x_range, y_range, max_iter, div_radius, dtype=dtype, workers=workers, **options)
+
+    return encode_png(colorize(res, colormap), filename)
+
+
+def _keyframe(zoom, center, size, max_iter, div_radius, cache, workers):
+    """
+    Escape times of a size x size keyframe with square pixels and the
+    position of center in it as (column, row, pixel size).
+    """
+    if zoom > DEEP_ZOOM:
+        res = perturbation(zoom, center, max_iter, div_radius, shape=(size, size), workers=workers)
+        return res, (size - 1) / 2, (size - 1) / 2, 2 * (2 / 2 ** zoom) / (size - 1)
+    x, y = float(center[0]), float(center[1])
+    shape = (size, size)
+    res = cache.render(zoom, (x, y), max_iter, div_radius, shape=shape, workers=workers,
+                       interior_check=True)
+    step, i0, j0 = cache.snap(zoom, (x, y), shape)
+    return res, x / step - i0, (j0 + size - 1) - y / step, step
+
+
+def zoom_animation(center, zoom_from, zoom_to, frames=100, filename=None, format="gif", max_iter=200,
+                   div_radius=4, size=300, delay_ms=40, cache=None, workers=None, colormap=HOT):
+    """
+    Zooms from zoom_from to zoom_to into center in an animated GIF (or APNG
+    with format="png") of size x size pixels, written to filename or returned
+    as bytes when filename is None.
+
+    Only one keyframe per doubling of the zoom is rendered, at twice the
+    size; the frames between two keyframes are crops of the first one scaled
+    down to size, so none of them is upscaled. Keyframes go through the tile
+    cache (a temporary one by default), which computes only three quarters of
+    each keyframe as the rest is in the keyframe before it. Frames are
+    written as soon as they are made and only the current keyframe is kept.
+    """
+    try:
+        import animation
+        import tilecache
+    except Exception:
+        from . import animation
+        from . import tilecache
+
+    workers = workers or os.cpu_count() or 1
+    out = io.BytesIO() if filename is None else open(filename, "wb")
+    scratch = None
+    if cache is None:
+        scratch = tempfile.TemporaryDirectory()
+        cache = tilecache.TileCache(scratch.name)
+    try:
+        if format == "gif":
+            writer = animation.GifWriter(out, (size, size), colormap, delay_ms)
+        elif format == "png":
+            writer = animation.ApngWriter(out, (size, size), frames, colormap, delay_ms)
+        else:
+            raise ValueError(f"unknown format {format!r}, use gif or png")
+
+        key = None
+        for frame in range(frames):
+            zoom = zoom_from + (zoom_to - zoom_from) * frame / max(frames - 1, 1)
+            # keyframes at zoom_from, zoom_from + 1, ... (or - 1 when zooming out)
+            k = math.floor(zoom - zoom_from) if zoom_to >= zoom_from else math.ceil(zoom - zoom_from) - 1
+            if key is None or key[0] != k:
+                res, col, row, step = _keyframe(zoom_from + k, center, 2 * size, max_iter, div_radius,
+                                                cache, workers)
+                image = Image.fromarray(color_index(res, 0, max_iter - 1, len(colormap)), "L")
+                key = (k, image, col, row, step)
+            _, image, col, row, step = key
+            # PIL boxes are in pixel edges, pixel i spans i .. i + 1; the box
+            # is kept inside the keyframe, which the snapping can miss by a pixel
+            half = min((2 / 2 ** zoom) / step + 0.5, size)
+            x = min(max(col + 0.5, half), 2 * size - half)
+            y = min(max(row + 0.5, half), 2 * size - half)
+            box = (x - half, y - half, x + half, y + half)
+            writer.add(np.asarray(image.resize((size, size), Image.BILINEAR, box=box)))
+        writer.close()
+        return out.getvalue() if filename is None else None
+    finally:
+        if filename is not None:
+            out.close()
+        if scratch is not None:
+            scratch.cleanup()
+
+
+def interesting_regions(zoom, center, max_iter=200, div_radius=4, samples=64, cells=8, count=5):
+    """
+    Where to zoom next from a view: the view is sampled on a samples x
+    samples grid of escape times, split into cells x cells regions, and the
+    regions are scored by how much the escape times change between
+    neighbouring samples (boundary density) plus their spread. Regions that
+    are all inside the set score nothing and ones that mix inside and outside
+    count double.
+
+    Returns up to count (x, y, zoom, score) tuples, best first, where x and y
+    are decimal strings and zoom makes the region fill the view. A 64 x 64
+    sample costs about 1% of a 600 x 600 render.
+    """
+    shape = (samples, samples)
+    if zoom > DEEP_ZOOM:
+        counts = perturbation(zoom, center, max_iter, div_radius, shape=shape)
+    else:
+        x_range, y_range = view_axes(zoom, (float(center[0]), float(center[1])), shape)
+        counts = render_grid(x_range, y_range, max_iter, div_radius, interior_check=True)
+
+    values = np.log1p(counts.astype(np.float64))
+    edges = np.zeros(shape)
+    horizontal = np.abs(np.diff(values, axis=1))
+    vertical = np.abs(np.diff(values, axis=0))
+    edges[:, 1:] = np.maximum(edges[:, 1:], horizontal)
+    edges[:, :-1] = np.maximum(edges[:, :-1], horizontal)
+    edges[1:, :] = np.maximum(edges[1:, :], vertical)
+    edges[:-1, :] = np.maximum(edges[:-1, :], vertical)
+
+    side = samples // cells
+    blocks = (cells, side, cells, side)
+    inside = (counts[:cells * side, :cells * side] == max_iter - 1).reshape(blocks).mean(axis=(1, 3))
+    scores = (edges[:cells * side, :cells * side].reshape(blocks).mean(axis=(1, 3))
+              + values[:cells * side, :cells * side].reshape(blocks).std(axis=(1, 3)))
+    scores[inside == 1] = 0
+    scores[(inside > 0) & (inside < 1)] *= 2
+
+    next_zoom = zoom + math.log2(cells)
+    places = int(next_zoom * math.log10(2)) + 4
+    regions = []
+    with localcontext() as ctx:
+        ctx.prec = places + 10
+        extent = Decimal(2) / Decimal(2) ** Decimal(zoom)
+        cx, cy = Decimal(str(center[0])), Decimal(str(center[1]))
+        for flat in np.argsort(scores, axis=None)[::-1][:count]:
+            row, col = divmod(int(flat), cells)
+            if scores[row, col] <= 0:
+                break
+            x = cx - extent + 2 * extent * (Decimal(col) + Decimal("0.5")) / cells
+            y = cy + extent - 2 * extent * (Decimal(row) + Decimal("0.5")) / cells
+            regions.append((f"{x:.{places}f}", f"{y:.{places}f}", next_zoom, float(scores[row, col])))
+    return regions
+
+
+"""
+BYTIE REPO : https://github.com/jbytecode/bytie
+
+
+1 - mandelbrot çizdir : mrgranddy
+
+2 - parametre alıp zoomdur/scale 
+    yaparak çizdir
+
+2.5 - opsiyonel: 
+      eğer ilginç bölgeleri bulmanın 
+      bir yolu varsa onu bul
+
+3 - bunun bi apisini yap
+
+4 - bytie'ye bağla
+
+
+
+"""
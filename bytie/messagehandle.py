@@ -1,5 +1,4 @@
 import ast
-import requests
 import hashlib
 import random
 import re
@@ -7,24 +6,37 @@ import os
 import glob
 import subprocess
 import atexit
+import shutil
 import json
-import urllib.request
-import yfinance
+import time
+from decimal import Decimal
 from os import path
-from numpy import fromstring, array2string
-from numpy.fft import fft
-import matplotlib.pyplot as plt
-from bs4 import BeautifulSoup
 
 try:
-    import mandelbrot
+    import cache
+    import dispatch
+    import httpclient
+    import lazy
+    import metrics
     import lambada
     import libstdlambada
 except Exception:
-    from . import mandelbrot
+    from . import cache
+    from . import dispatch
+    from . import httpclient
+    from . import lazy
+    from . import metrics
     from . import lambada
     from . import libstdlambada
 
+# Heavy modules are imported by the first handler that needs them.
+np = lazy.module("numpy")
+plt = lazy.module("matplotlib.pyplot")
+yfinance = lazy.module("yfinance")
+bs4 = lazy.module("bs4")
+mandelbrot = lazy.sibling("mandelbrot", __package__)
+tilecache = lazy.sibling("tilecache", __package__)
+
 
 try:
     HOST = os.environ["BYTIE_HOST"] 
@@ -33,6 +45,12 @@ except KeyError:
     HOST = 'http://localhost/'
     PATH = './.tmp'
 
+# base url of a renderservice.py that renders the Mandelbrot views into PATH,
+# e.g. http://127.0.0.1:9110; without it they are rendered in process
+RENDER_SERVICE = os.getenv("BYTIE_RENDER_SERVICE")
+RENDER_TIMEOUT = 120
+RENDER_WAIT = 5
+
 # initialize interpreter
 lambadainterpreter = lambada.Interpreter()
 lambadainterpreter.addvar(
@@ -49,37 +67,74 @@ lambadainterpreter.addvar(
     "random", lambada.PythonFunctionExpression(libstdlambada.draw_random_numbers))
 
 message_handlers = []
+command_index = dispatch.CommandIndex()
+
+
+CONFUSED = 'Beep boop! bytie is confused! '
+
+
+def invoke(func, argument: str):
+    try:
+        return func(argument)
+    except Exception as e:
+        return CONFUSED + str(e)
+
+
+def observe(entry: dict, seconds: float, result):
+    error = isinstance(result, str) and result.startswith(CONFUSED)
+    metrics.observe_handler(entry["name"], seconds, result, error)
+
+
+def call_handler(entry: dict, argument: str):
+    start = time.perf_counter()
+    result = invoke(entry["function"], argument)
+    observe(entry, time.perf_counter() - start, result)
+    return result
+
+
+def match_handlers(message: str) -> list:
+    "Returns [(handler, argument), ...] for the handlers that fire on message."
+    return command_index.match(message)
+
+
+def message_handler(name: str, prefix: bool = True, probability: float = 0.0,
+                    executor: str = None, concurrency: int = None, cost: str = None):
+    """
+    Registers func as the handler of messages starting with name.
 
+    executor tells the bot where to run the handler: None runs it on the event
+    loop (only for cheap handlers), "thread" in the I/O thread pool and
+    "process" in the CPU process pool. concurrency bounds how many calls of
+    this handler may run at the same time. cost is the scheduling class
+    ("cheap", "normal" or "expensive"); by default inline handlers are cheap
+    and the others normal.
+    """
+    if executor not in (None, "thread", "process"):
+        raise ValueError(f"Unknown executor '{executor}' for handler '{name}'")
+    if cost is None:
+        cost = "cheap" if executor is None else "normal"
+    if cost not in ("cheap", "normal", "expensive"):
+        raise ValueError(f"Unknown cost '{cost}' for handler '{name}'")
 
-def message_handler(name: str, prefix: bool = True, probability: float = 0.0):
     def decorator(func):
-        def handler(message):
-            if (prefix and message.startswith(name + ' ')) or (not prefix and message == name):
-                msg = message[min(len(message), len(name)+1):]
-                try:
-                    return func(msg)
-                except Exception as e:
-                    return 'Beep boop! bytie is confused! ' + str(e)
-            elif random.random() < probability:
-                try:
-                    return func(message)
-                except Exception as e:
-                    return 'Beep boop! bytie is confused! ' + str(e)
-            return None
         if func.__doc__ == None:
             # dev warning message
             print(
                 f"Please provide a docstring for your message handler '{name}'. This will be used for help messages."
             )
             return func
-        message_handlers.append({
+        entry = {
             "name": name,
             "prefix": prefix,
             "probability": probability,
-            "handler": handler,
             "help_message": func.__doc__,
-            "function": func
-        })
+            "function": func,
+            "executor": executor,
+            "concurrency": concurrency,
+            "cost": cost
+        }
+        message_handlers.append(entry)
+        command_index.add(entry)
         return func
 
     return decorator
@@ -134,10 +189,10 @@ def bytie_handle_8ball(command: str) -> str:
     return eight_ball_messages[number % len(eight_ball_messages)]
 
 
-@message_handler('dadjoke', prefix=False)
+@message_handler('dadjoke', prefix=False, executor="thread")
 def bytie_handle_dadjoke(command: str) -> str:
     "dadjoke: I prepare a top quality joke for you."
-    resp = requests.get(
+    resp = httpclient.get(
         "https://icanhazdadjoke.com", headers={"Accept": "application/json"}
     )
     if resp.status_code == 200:
@@ -147,10 +202,10 @@ def bytie_handle_dadjoke(command: str) -> str:
         return "Couldn't get a dadjoke :("
 
 
-@message_handler("say something new", prefix=False)
+@message_handler("say something new", prefix=False, executor="thread")
 def bytie_handle_saysomethingnew(message: str) -> str:
     "say something new: Let me pick new things!"
-    resp = requests.get("https://uselessfacts.jsph.pl/random.txt?language=en")
+    resp = httpclient.get("https://uselessfacts.jsph.pl/random.txt?language=en")
     if resp.status_code == 200:
         return resp.text.split("\n")[0]
     else:
@@ -183,31 +238,35 @@ def ebobekok(raw_numbers: str) -> str:
     result = "**EBOB:** " + str(resultofGCD) + " & **EKOK:** " + str(resultofLCM)
     return result
 
-@message_handler("ss")
+@message_handler("ss", executor="thread")
 def ss(gelenURL: str) -> str:
     "ss: capture screenshots from any website."
     user_agent = 'Mozilla/5.0 (Windows; U; Windows NT 5.1; en-US; rv:1.9.0.7) Gecko/2009021910 Firefox/3.0.7'
     url = "https://screenshotapi.net/api/v1/screenshot?token=U431LMTYAYRB0EBBSC6IM7KPUDENA4XJ&url="+gelenURL+"&height=1080&fresh=true"
     headers={'User-Agent':user_agent,}
-    request=urllib.request.Request(url,None,headers)
-    operUrl = urllib.request.urlopen(request)
-    if(operUrl.getcode()==200):
+    operUrl = httpclient.get(url, headers=headers)
+    if(operUrl.status_code==200):
         result = ""
-        data = operUrl.read()
+        data = operUrl.content
         jsonData = json.loads(data)
         result = "**Üretilme zamanı:** " + jsonData["created_at"] + "\n**Paylaş:**\n" + jsonData["screenshot"]
     else:
-        print("olmadı: ", operUrl.getcode())
+        print("olmadı: ", operUrl.status_code)
     return result 
 
-@message_handler("tdk")
+@cache.cached(ttl=24 * 60 * 60, maxsize=1024, key=lambda word: word.strip())
+def fetch_tdk(word: str):
+    url = "https://sozluk.gov.tr/gts?ara=" + word.strip()
+    page = httpclient.get(url).text
+    return json.loads(page)
+
+
+@message_handler("tdk", executor="thread")
 def tdk(word: str) -> str:
     "tdk: turkish dictionary"
     word = word.strip()
-    url = "https://sozluk.gov.tr/gts?ara=" + word
-    page = requests.get(url).text
-    page_json = json.loads(page)
-    
+    page_json = fetch_tdk(word)
+
     if type(page_json) == type({}) and "error" in page_json:
         return bytie_handle_iplikisyin(word + " milletin kendi kendini yönetmesidir")
 
@@ -228,15 +287,20 @@ def tdk(word: str) -> str:
             return "Bu ellenmemiş bir hata olabilir, TDK'yı açıp inceleyiniz, sıkıntıyı çözüp gerçekleyiniz."
 
 
-@message_handler("usd", prefix=False)
-def bytie_handle_dolar(message: str) -> str:
-    "usd: Price of USD in Turkish Liras"
-    webcontent = requests.get("https://themoneyconverter.com/USD/TRY").text
+@cache.cached(ttl=60, stale_while_revalidate=5 * 60)
+def fetch_usd_try() -> str:
+    webcontent = httpclient.get("https://themoneyconverter.com/USD/TRY").text
     parsed1 = webcontent.split("1 USD = ")
     dolartl = parsed1[1].split(" ")[0]
     return dolartl
 
 
+@message_handler("usd", prefix=False, executor="thread")
+def bytie_handle_dolar(message: str) -> str:
+    "usd: Price of USD in Turkish Liras"
+    return fetch_usd_try()
+
+
 @message_handler("fft?", prefix=False)
 def bytie_handle_fft(message: str) -> str:
     "fft?: I tell you top secret information about fft."
@@ -247,43 +311,150 @@ def bytie_handle_fft(message: str) -> str:
 def bytie_handle_fftCalc(xs: str) -> str:
     "fft <',' or ' ' seperated numbers>: I calculate fft of your numbers."
     if ',' in xs:
-        xs = fromstring(xs, dtype=float, sep=",")
+        xs = np.fromstring(xs, dtype=float, sep=",")
     else:
-        xs = fromstring(xs, dtype=float, sep=" ")
+        xs = np.fromstring(xs, dtype=float, sep=" ")
     if xs.size > 0:
-        return array2string(fft(xs), precision=2)
+        return np.array2string(np.fft.fft(xs), precision=2)
     else:
         return "meh"
 
 
-@message_handler("mandelbrot")
+@message_handler("mandelbrot", executor="thread", cost="expensive")
 def bytie_handle_mandelbrot(command: str) -> str:
     "mandelbrot ${x} ${y} ${zoom} ${iterations} ${divergence_radius} : I generate a mandelbrot image for you."
     args = command.split()
     try:
-        x = float(args[0])
-        y = float(args[1])
+        # kept as text, deep zooms need more digits than a float has
+        x = str(Decimal(args[0]))
+        y = str(Decimal(args[1]))
         zoom = float(args[2])
         max_iter = int(args[3])
         divergance_radius = float(args[4])
     except:
         return "Please feed a zoom and a center paramter! Also maximum number of iterations and divergence radius!"
 
+    if RENDER_SERVICE:
+        return render_remote({"x": x, "y": y, "zoom": zoom, "max_iter": max_iter,
+                              "div_radius": divergance_radius})
+
+    try:
+        mandelbrot.check_view(zoom, max_iter, divergance_radius)
+    except ValueError as e:
+        return f"Sorry, {e}."
+
     filename = f"image_{x}_{y}_{zoom}_{max_iter}_{divergance_radius}.png"
     filepath = f"{PATH}/{filename}"
     url = f"{HOST}/{filename}"
     if not(path.exists(filepath)):
         mandelbrot.mandelbrot(zoom=zoom, center=(
-            x, y), filename=filepath, max_iter=max_iter, div_radius=divergance_radius)
+            x, y), filename=filepath, max_iter=max_iter, div_radius=divergance_radius,
+            cache=mandelbrot_tiles())
     return url
 
 
-@message_handler("XTRY")
+def render_remote(view: dict) -> str:
+    "Submits a view to the render service and waits for the image."
+    resp = httpclient.post(f"{RENDER_SERVICE}/jobs", json=view)
+    if resp.status_code == 503:
+        return "The renderer is too busy, try again later."
+    if 400 <= resp.status_code < 500:
+        # the service says what is wrong with the view
+        try:
+            return resp.json()["error"]
+        except (ValueError, KeyError, TypeError):
+            pass
+    resp.raise_for_status()
+    job = resp.json()
+    deadline = time.monotonic() + RENDER_TIMEOUT
+    while job["status"] in ("queued", "running"):
+        if time.monotonic() > deadline:
+            return "Your image is still in the oven, ask me again in a minute."
+        resp = httpclient.get(f"{RENDER_SERVICE}/jobs/{job['id']}?wait={RENDER_WAIT}",
+                              timeout=(httpclient.CONNECT_TIMEOUT, RENDER_WAIT + httpclient.READ_TIMEOUT))
+        resp.raise_for_status()
+        job = resp.json()
+    if job["status"] != "done":
+        return CONFUSED + str(job["error"])
+    return f"{HOST}/{job['file']}"
+
+
+MANDELZOOM_FRAMES = 200
+
+
+@message_handler("mandelzoom", executor="thread", cost="expensive")
+def bytie_handle_mandelzoom(command: str) -> str:
+    "mandelzoom ${x} ${y} ${zoom from} ${zoom to} [${frames}] [${iterations}] : I zoom into the mandelbrot set for you."
+    args = command.split()
+    try:
+        x = str(Decimal(args[0]))
+        y = str(Decimal(args[1]))
+        zoom_from = float(args[2])
+        zoom_to = float(args[3])
+        frames = int(args[4]) if len(args) > 4 else 100
+        max_iter = int(args[5]) if len(args) > 5 else 200
+    except:
+        return "Please feed a center, a start and an end zoom! Number of frames and iterations are optional."
+    if not 2 <= frames <= MANDELZOOM_FRAMES:
+        return f"I can make 2 to {MANDELZOOM_FRAMES} frames."
+    try:
+        mandelbrot.check_view(zoom_from, max_iter, 4)
+        mandelbrot.check_view(zoom_to, max_iter, 4)
+    except ValueError as e:
+        return f"Sorry, {e}."
+
+    filename = f"zoom_{x}_{y}_{zoom_from}_{zoom_to}_{frames}_{max_iter}.gif"
+    filepath = f"{PATH}/{filename}"
+    if not(path.exists(filepath)):
+        mandelbrot.zoom_animation((x, y), zoom_from, zoom_to, frames=frames, filename=filepath,
+                                  max_iter=max_iter, cache=mandelbrot_tiles())
+    return f"{HOST}/{filename}"
+
+@message_handler("mandelbrot?", executor="thread")
+def bytie_handle_mandelbrot_regions(command: str) -> str:
+    "mandelbrot? ${x} ${y} ${zoom} [${iterations}] : I tell you where to zoom next."
+    args = command.split()
+    try:
+        x = str(Decimal(args[0]))
+        y = str(Decimal(args[1]))
+        zoom = float(args[2])
+        max_iter = int(args[3]) if len(args) > 3 else 200
+    except:
+        return "Please feed a center and a zoom! Maximum number of iterations is optional."
+    try:
+        mandelbrot.check_view(zoom, max_iter, 4)
+    except ValueError as e:
+        return f"Sorry, {e}."
+
+    regions = mandelbrot.interesting_regions(zoom, (x, y), max_iter=max_iter)
+    if not regions:
+        return "Nothing interesting here, try zooming out."
+    return "\n".join(f"mandelbrot {rx} {ry} {rzoom:g} {max_iter} 4" for rx, ry, rzoom, _ in regions)
+
+
+MANDELBROT_TILE_BYTES = 512 * 1024 * 1024
+_mandelbrot_tiles = None
+
+
+def mandelbrot_tiles():
+    global _mandelbrot_tiles
+    if _mandelbrot_tiles is None:
+        _mandelbrot_tiles = tilecache.TileCache(
+            f"{PATH}/mandelbrot-tiles", max_bytes=MANDELBROT_TILE_BYTES)
+    return _mandelbrot_tiles
+
+
+@cache.cached(ttl=10 * 60, stale_while_revalidate=60 * 60)
+def fetch_try_rates() -> dict:
+    return httpclient.get(
+        "https://api.exchangeratesapi.io/latest?base=TRY").json()["rates"]
+
+
+@message_handler("XTRY", executor="thread")
 def bytie_handle_XTRY(currency: str) -> str:
     "XTRY ${abbr. of currency}: Price of a currency in Turkish Liras"
     currency = currency.upper()
-    r = requests.get(
-        "https://api.exchangeratesapi.io/latest?base=TRY").json()["rates"]
+    r = fetch_try_rates()
     if currency in r:
         XTRY = 1/r[currency]
         return f"{currency}TRY: {XTRY:.2f}"
@@ -291,17 +462,21 @@ def bytie_handle_XTRY(currency: str) -> str:
         return "Please enter a valid currency abbrevation"
 
 
-@message_handler("lambada")
+# The interpreter keeps state between calls, so it runs one command at a time.
+@message_handler("lambada", executor="thread", concurrency=1, cost="expensive")
 def bytie_lambada_command(command: str) -> str:
     "lambada {expression}: I want to be Clojure when I grow up"
     try:
         result = lambadainterpreter.interprete(command)
+        if isinstance(result, np.ndarray):
+            # numpy prints long vectors summarized
+            return str(result)
         return result
     except BaseException as inst:
         return str(inst)
 
 
-@message_handler("!xkcd")
+@message_handler("!xkcd", executor="thread")
 def bytie_xkcd_command(command: str) -> str:
     "!xkcd {num}: I show you the xkcd you specified. Random xkcd for bad inputs."
     try:
@@ -311,18 +486,34 @@ def bytie_xkcd_command(command: str) -> str:
         return bytie_handle_randomxkcd()
 
 
-def bytie_handle_xkcd(n):
-    r = requests.get(f"https://xkcd.com/{n}/info.0.json")
+# published comics never change
+@cache.cached(ttl=30 * 24 * 60 * 60, maxsize=4096)
+def fetch_xkcd_image(n: int):
+    r = httpclient.get(f"https://xkcd.com/{n}/info.0.json")
     if r.status_code == 200:
         return r.json()["img"]
+    return None
+
+
+@cache.cached(ttl=60 * 60)
+def fetch_latest_xkcd():
+    r = httpclient.get(f"https://xkcd.com/info.0.json")
+    if r.status_code == 200:
+        return r.json()["num"]
+    return None
+
+
+def bytie_handle_xkcd(n):
+    img = fetch_xkcd_image(n)
+    if img is not None:
+        return img
     else:
         return f"Two possibilities exist: either xkcd down or xkcd {n} does not exist. Both are equally terrifying."
 
 
 def bytie_handle_randomxkcd():
-    r = requests.get(f"https://xkcd.com/info.0.json")
-    if r.status_code == 200:
-        maxkcd = r.json()["num"]
+    maxkcd = fetch_latest_xkcd()
+    if maxkcd is not None:
         rnd = random.randint(1, maxkcd)
         return (bytie_handle_xkcd(rnd))
     else:
@@ -420,7 +611,10 @@ def bytie_handle_clean_temp(message: str) -> str:
     "bytie clean temp!: Trig my garbage collector!"
     files = glob.glob(PATH + "/*")
     for f in files:
-        os.remove(f)
+        if path.isdir(f):
+            shutil.rmtree(f)
+        else:
+            os.remove(f)
     L = len(files)
     return f"I removed {L} garbage(s)"
 
@@ -442,7 +636,8 @@ def bytie_handle_python(message: str) -> str:
     return "python is great, and you should feel proud of it."
 
 
-@message_handler("stonks")
+# pyplot keeps global state, so plots are drawn in worker processes.
+@message_handler("stonks", executor="process", cost="expensive")
 def bytie_handle_stonks(command: str) -> str:
     "stonks {STOCKCODE}: as historical as Fortran. See: stock"
     stockname = command
@@ -464,7 +659,7 @@ def bytie_handle_stonks(command: str) -> str:
         return url
 
 
-@message_handler("stock")
+@message_handler("stock", executor="thread", cost="expensive")
 def bytie_handle_stock(command: str) -> str:
     "stock {STOCKCODE}: Örnek vereyim, stock GOOG"
     stockinfo = yfinance.Ticker(command)
@@ -478,10 +673,10 @@ def bytie_handle_stock(command: str) -> str:
         return result
 
 
-@message_handler("datetime")
+@message_handler("datetime", executor="thread")
 def bytie_handle_datetime(command: str) -> str:
     "datetime region/location: I don't need an  watch."
-    capt = requests.get(
+    capt = httpclient.get(
         f"http://worldtimeapi.org/api/timezone/{command}")
     result = ""
     try:
@@ -492,12 +687,12 @@ def bytie_handle_datetime(command: str) -> str:
     return result
 
 
-@message_handler('bytie korona!', prefix=False)
+@message_handler('bytie korona!', prefix=False, executor="thread")
 def bytie_handle_covid(command: str) -> str:
     "bytie korona!: I show you daily vaka sayısı."
 
     url = 'https://covid19.saglik.gov.tr/TR-66935/genel-koronavirus-tablosu.html'
-    content = requests.get(url).text
+    content = httpclient.get(url).text
 
     try:
         rgx = r"var geneldurumjson = (\[.*?\]);//]]"
@@ -519,7 +714,7 @@ def bytie_handle_covid(command: str) -> str:
         return "Format değişmiş haberin yok! " + str(e) + " :/"
 
 
-@message_handler('bytie weather')
+@message_handler('bytie weather', executor="thread")
 def bytie_weather(command: str) -> str:
     "bytie weather: I show you weather condition anywhere in the world. bytie weather <city>"
     command = command.capitalize()
@@ -528,8 +723,8 @@ def bytie_weather(command: str) -> str:
         new[0] = "I"
         command = ''.join(new)
     url = "https://www.google.com/search?q=" + "weather" + command
-    html = requests.get(url).content
-    soup = BeautifulSoup(html, 'html.parser')
+    html = httpclient.get(url).content
+    soup = bs4.BeautifulSoup(html, 'html.parser')
     temp = soup.find('div', attrs={'class': 'BNeawe iBp4i AP7Wnd'}).text
     str1 = soup.find('div', attrs={'class': 'BNeawe tAd8D AP7Wnd'}).text
     data = str1.split('\n')
@@ -538,7 +733,7 @@ def bytie_weather(command: str) -> str:
     return result
 
 
-@message_handler('|>')
+@message_handler('|>', executor="thread")
 def bytie_pipe(command: str) -> str:
     "|> cmd1 |> cmd2 ... : pipe outputs of your commands."
     sequence = [i.strip() for i in command.split("|>")]
@@ -547,13 +742,13 @@ def bytie_pipe(command: str) -> str:
         return ""
 
     cmd = sequence[0]
-    acc = handle_string(cmd)
+    acc = handle_string(cmd, piped=True)
     if acc is None:
         return "yalan yanlış komutlar: " + str(cmd)
     for cmd in sequence[1:]:
 
         cmd_and_arg = cmd + " " + acc
-        acc = handle_string(cmd_and_arg)
+        acc = handle_string(cmd_and_arg, piped=True)
         if acc is None:
             return "yalan yanlış komutlar: " + str(cmd)
 
@@ -587,9 +782,13 @@ def bytie_split(command: str) -> str:
     return res
 
 
-def handle_string(text):
-    for handler in message_handlers:
-        res = handler['handler'](text)
+def handle_string(text, piped: bool = False):
+    for entry, argument in match_handlers(text):
+        if piped and entry["executor"] == "process":
+            # a pipe runs its stages on its own thread, and the process
+            # handlers (pyplot) are not thread safe
+            raise ValueError(f"'{entry['name']}' can not be used in a pipe")
+        res = call_handler(entry, argument)
         if res is not None:
             return res
     return None
@@ -602,7 +801,7 @@ if __name__ == '__main__':
         return message + ', indeed.'
     while True:
         text = input("bytie> ")
-        for handler in message_handlers:
-            message = handler['handler'](text)
+        for entry, argument in match_handlers(text):
+            message = call_handler(entry, argument)
             if message:
                 print(message)
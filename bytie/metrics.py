@@ -0,0 +1,162 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (0, 16, 64, 256, 1024, 4096, 16384, 65536)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            lines.extend(self._render_value(labels, value))
+        return lines
+
+    def _render_value(self, labels, value) -> list:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {value}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, *labels):
+        with self.lock:
+            self.values[labels] = value
+
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        with self.lock:
+            counts = self.values.get(labels)
+            if counts is None:
+                # one count per bucket, then +Inf, sum and count
+                counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def _render_value(self, labels, counts) -> list:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            le = _labels(self.labelnames, labels, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        plain = _labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{plain} {counts[-2]}")
+        lines.append(f"{self.name}_count{plain} {counts[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+handler_calls = registry.register(Counter(
+    "bytie_handler_calls_total", "Number of handler calls.", ["handler"]))
+handler_errors = registry.register(Counter(
+    "bytie_handler_errors_total", "Number of handler calls that ended confused.", ["handler"]))
+handler_latency = registry.register(Histogram(
+    "bytie_handler_latency_seconds", "Time from dispatch to handler result.", ["handler"]))
+handler_output = registry.register(Histogram(
+    "bytie_handler_output_bytes", "Size of handler results.", ["handler"], SIZE_BUCKETS))
+event_loop_lag = registry.register(Histogram(
+    "bytie_event_loop_lag_seconds", "How late the event loop wakes up.",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)))
+send_queue_depth = registry.register(Gauge(
+    "bytie_send_queue_depth", "Messages waiting to be sent to Discord."))
+scheduler_queued = registry.register(Gauge(
+    "bytie_scheduler_queued", "Handler calls waiting for a worker slot.", ["cost"]))
+scheduler_rejected = registry.register(Counter(
+    "bytie_scheduler_rejected_total", "Handler calls refused by admission control.", ["cost", "reason"]))
+
+
+def observe_handler(name: str, seconds: float, result, error: bool = False):
+    handler_calls.inc(name)
+    if error:
+        handler_errors.inc(name)
+    handler_latency.observe(seconds, name)
+    size = len(str(result).encode("utf-8")) if result is not None else 0
+    handler_output.observe(size, name)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_http_server(port: int, host: str = "127.0.0.1", registry: Registry = registry):
+    "Serves the metrics as Prometheus text on http://host:port/metrics in a daemon thread."
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, daemon=True,
+                     name="bytie-metrics").start()
+    return server
@@ -0,0 +1,112 @@
+import asyncio
+from collections import deque
+
+try:
+    import metrics
+    import ratelimit
+except Exception:
+    from . import metrics
+    from . import ratelimit
+
+# Discord refuses messages longer than this
+MESSAGE_LIMIT = 2000
+# above this many characters a reply is sent as a text file
+ATTACHMENT_THRESHOLD = 3 * MESSAGE_LIMIT
+# Discord allows about 5 messages per 5 seconds in a channel
+CHANNEL_RATE = 1.0
+CHANNEL_BURST = 5
+
+
+def pack(text: str, limit: int = MESSAGE_LIMIT) -> list:
+    """
+    Splits text into as few parts of at most limit characters as possible,
+    cutting at line breaks or spaces when there is one in the second half of
+    a part. Joining the parts gives back text.
+    """
+    parts = []
+    start = 0
+    while len(text) - start > limit:
+        end = start + limit
+        cut = text.rfind("\n", start + limit // 2, end)
+        if cut == -1:
+            cut = text.rfind(" ", start + limit // 2, end)
+        cut = end if cut == -1 else cut + 1
+        parts.append(text[start:cut])
+        start = cut
+    if start < len(text):
+        parts.append(text[start:])
+    return parts
+
+
+class Outbox:
+    """
+    Per channel queue of outgoing replies.
+
+    Replies that pile up while a channel is busy are merged into as few
+    messages as possible, long replies become a single file attachment and
+    each channel stays under its rate limit. Channels are served
+    concurrently.
+    """
+
+    def __init__(self, make_file=None, limit: int = MESSAGE_LIMIT,
+                 attachment_threshold: int = ATTACHMENT_THRESHOLD,
+                 rate: float = CHANNEL_RATE, burst: float = CHANNEL_BURST):
+        # make_file(data: bytes, filename: str) builds the attachment object
+        self.make_file = make_file
+        self.limit = limit
+        self.attachment_threshold = attachment_threshold
+        self.rate = rate
+        self.burst = burst
+        self.pending = {}
+        self.buckets = {}
+        self.tasks = set()
+
+    def put(self, channel, text):
+        key = getattr(channel, "id", id(channel))
+        queue = self.pending.get(key)
+        start = queue is None
+        if start:
+            queue = self.pending[key] = deque()
+        queue.append(str(text))
+        metrics.send_queue_depth.inc()
+        if start:
+            task = asyncio.create_task(self._drain(key, channel, queue))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def flush(self):
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks))
+
+    def _bucket(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = ratelimit.TokenBucket(self.rate, self.burst)
+        return bucket
+
+    async def _drain(self, key, channel, queue):
+        bucket = self._bucket(key)
+        try:
+            while queue:
+                texts = [queue.popleft()]
+                size = len(texts[0])
+                while queue and size + 1 + len(queue[0]) <= self.attachment_threshold:
+                    size += 1 + len(queue[0])
+                    texts.append(queue.popleft())
+                metrics.send_queue_depth.dec(amount=len(texts))
+                try:
+                    await self._send(channel, bucket, "\n".join(texts))
+                except Exception as e:
+                    print(f"Could not send to {key}: {e}")
+        finally:
+            metrics.send_queue_depth.dec(amount=len(queue))
+            del self.pending[key]
+
+    async def _send(self, channel, bucket, text: str):
+        if len(text) > self.attachment_threshold and self.make_file is not None:
+            await bucket.take()
+            await channel.send(file=self.make_file(text.encode("utf-8"), "bytie.txt"))
+            return
+        for part in pack(text, self.limit):
+            await bucket.take()
+            await channel.send(part)
@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Allows rate tokens per second on average with bursts of up to capacity
+    tokens.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, n: float = 1) -> bool:
+        self._refill()
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    def delay(self, n: float = 1) -> float:
+        "Seconds until n tokens are available."
+        self._refill()
+        return max(0.0, (n - self.tokens) / self.rate)
+
+    async def take(self, n: float = 1):
+        while not self.try_take(n):
+            await asyncio.sleep(self.delay(n))
@@ -0,0 +1,259 @@
+"""
+Local HTTP service that renders Mandelbrot views from a job queue, so the
+bot does not have to render in its own process.
+
+    python bytie/renderservice.py --port 9110 --dir ./.tmp
+
+    POST /jobs             {"x": "-0.5", "y": "0", "zoom": 1} or {"views": [...]}
+    GET  /jobs/<id>?wait=5 status of a job, waiting up to 5s for it to finish
+    GET  /files/<name>     a rendered image
+
+A view has x, y and zoom and optionally max_iter (200) and div_radius (4), within
+the bounds of mandelbrot.check_view.
+Identical views share one job. When the queue is full new jobs are refused
+with 503.
+"""
+import argparse
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    import mandelbrot
+    import tilecache
+except Exception:
+    from . import mandelbrot
+    from . import tilecache
+
+QUEUE_LIMIT = 64
+# finished jobs remembered for status polling and deduplication
+HISTORY = 1024
+MAX_WAIT = 30
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFull(Exception):
+    pass
+
+
+def parse_view(view: dict) -> dict:
+    "Checked and normalized copy of a view, raises ValueError for a bad one."
+    try:
+        x, y = Decimal(str(view["x"])), Decimal(str(view["y"]))
+        parsed = {
+            "x": str(x.normalize()),
+            "y": str(y.normalize()),
+            "zoom": float(view["zoom"]),
+            "max_iter": int(view.get("max_iter", 200)),
+            "div_radius": float(view.get("div_radius", 4)),
+        }
+        if not (x.is_finite() and y.is_finite()):
+            raise ValueError("x and y must be numbers")
+        mandelbrot.check_view(parsed["zoom"], parsed["max_iter"], parsed["div_radius"])
+    except Exception as e:
+        raise ValueError(f"bad view {view!r}: {e}")
+    return parsed
+
+
+class Job:
+    def __init__(self, id: str, view: dict, filename: str):
+        self.id = id
+        self.view = view
+        self.filename = filename
+        self.status = QUEUED
+        self.error = None
+        self.submitted = time.time()
+        self.seconds = None
+        self.finished = threading.Event()
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "status": self.status, "view": self.view, "file": self.filename,
+                "error": self.error, "seconds": self.seconds}
+
+
+class RenderService:
+    """
+    Renders views on worker threads from a bounded queue. A job is named
+    after its view, so submitting a view that is queued, running or already
+    rendered returns the existing job instead of rendering it again.
+    """
+
+    def __init__(self, directory: str, threads: int = 1, queue_limit: int = QUEUE_LIMIT,
+                 history: int = HISTORY, render=None):
+        self.directory = directory
+        self.queue = queue.Queue(queue_limit)
+        self.history = history
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.cache = tilecache.TileCache(os.path.join(directory, "mandelbrot-tiles"))
+        # render(view, filepath) draws a view, mandelbrot.mandelbrot by default
+        self.render = render or self._render
+        os.makedirs(directory, exist_ok=True)
+        for n in range(threads):
+            threading.Thread(target=self._work, daemon=True, name=f"bytie-render-{n}").start()
+
+    def _render(self, view: dict, filepath: str):
+        mandelbrot.mandelbrot(zoom=view["zoom"], center=(view["x"], view["y"]), filename=filepath,
+                              max_iter=view["max_iter"], div_radius=view["div_radius"], cache=self.cache)
+
+    def submit(self, views: list) -> list:
+        """
+        Jobs for the views, in order. Either all new jobs are queued or, when
+        there is no room for them, none is and QueueFull is raised.
+        """
+        views = [parse_view(view) for view in views]
+        with self.lock:
+            jobs, new = [], []
+            for view in views:
+                key = json.dumps(view, sort_keys=True)
+                id = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+                job = self.jobs.get(id)
+                # a failed job is tried again, and so is a done one whose
+                # image was cleaned up since (bytie clean temp!)
+                if job is None or job.status == FAILED or (
+                        job.status == DONE and not os.path.exists(os.path.join(self.directory, job.filename))):
+                    job = Job(id, view, f"mandelbrot_{id}.png")
+                    if os.path.exists(os.path.join(self.directory, job.filename)):
+                        job.status = DONE
+                        job.finished.set()
+                    else:
+                        new.append(job)
+                    self.jobs[id] = job
+                self.jobs.move_to_end(id)
+                jobs.append(job)
+            if self.queue.qsize() + len(new) > self.queue.maxsize:
+                for job in new:
+                    del self.jobs[job.id]
+                raise QueueFull(f"{len(new)} new jobs, room for {self.queue.maxsize - self.queue.qsize()}")
+            for job in new:
+                self.queue.put_nowait(job)
+            self._forget()
+        return jobs
+
+    def _forget(self):
+        finished = [id for id, job in self.jobs.items() if job.finished.is_set()]
+        for id in finished[:max(0, len(self.jobs) - self.history)]:
+            del self.jobs[id]
+
+    def get(self, id: str, wait: float = 0):
+        with self.lock:
+            job = self.jobs.get(id)
+        if job is not None and wait > 0:
+            job.finished.wait(min(wait, MAX_WAIT))
+        return job
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            job.status = RUNNING
+            start = time.perf_counter()
+            try:
+                path = os.path.join(self.directory, job.filename)
+                tmp = f"{path}.{threading.get_ident()}.tmp.png"
+                self.render(job.view, tmp)
+                os.replace(tmp, path)
+                job.status = DONE
+            except Exception as e:
+                job.error = str(e)
+                job.status = FAILED
+            finally:
+                job.seconds = time.perf_counter() - start
+                job.finished.set()
+                self.queue.task_done()
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body, content_type: str = "application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        service = self.server.service
+        if urlsplit(self.path).path != "/jobs":
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            batch = "views" in body
+            jobs = service.submit(body["views"] if batch else [body])
+        except QueueFull as e:
+            self._send(503, {"error": str(e)})
+            return
+        except (ValueError, TypeError, AttributeError) as e:
+            self._send(400, {"error": str(e)})
+            return
+        result = [job.to_dict() for job in jobs]
+        self._send(202, {"jobs": result} if batch else result[0])
+
+    def do_GET(self):
+        service = self.server.service
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "jobs":
+            try:
+                wait = float(parse_qs(url.query).get("wait", ["0"])[0])
+            except ValueError:
+                wait = 0
+            job = service.get(parts[1], wait)
+            if job is None:
+                self._send(404, {"error": f"no job {parts[1]}"})
+            else:
+                self._send(200, job.to_dict())
+        elif len(parts) == 2 and parts[0] == "files" and parts[1].startswith("mandelbrot_"):
+            try:
+                with open(os.path.join(service.directory, os.path.basename(parts[1])), "rb") as f:
+                    data = f.read()
+            except (FileNotFoundError, IsADirectoryError):
+                self._send(404, {"error": "not found"})
+                return
+            self._send(200, data, "image/png")
+        else:
+            self._send(404, {"error": "not found"})
+
+    def log_message(self, *args):
+        pass
+
+
+def start_http_server(service: RenderService, port: int, host: str = "127.0.0.1"):
+    "Serves the service on http://host:port in a daemon thread."
+    server = ThreadingHTTPServer((host, port), _ServiceHandler)
+    server.service = service
+    threading.Thread(target=server.serve_forever, daemon=True, name="bytie-render-http").start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9110)
+    parser.add_argument("--dir", default=os.getenv("BYTIE_PATH", "./.tmp"), help="where images are written")
+    parser.add_argument("--threads", type=int, default=1, help="jobs rendered at the same time")
+    parser.add_argument("--queue", type=int, default=QUEUE_LIMIT, help="jobs waiting at most")
+    args = parser.parse_args()
+
+    service = RenderService(args.dir, threads=args.threads, queue_limit=args.queue)
+    server = ThreadingHTTPServer((args.host, args.port), _ServiceHandler)
+    server.service = service
+    print(f"Rendering into {args.dir} on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+
+try:
+    import metrics
+    import ratelimit
+except Exception:
+    from . import metrics
+    from . import ratelimit
+
+CHEAP = "cheap"
+NORMAL = "normal"
+EXPENSIVE = "expensive"
+COST_CLASSES = (CHEAP, NORMAL, EXPENSIVE)
+
+# cost class -> (tokens per second, burst) for each user and each channel
+USER_RATES = {CHEAP: (2, 10), NORMAL: (0.5, 5), EXPENSIVE: (0.1, 2)}
+CHANNEL_RATES = {CHEAP: (5, 20), NORMAL: (2, 10), EXPENSIVE: (0.5, 4)}
+# cost class -> (calls running at once, calls waiting at most)
+LANES = {NORMAL: (16, 64), EXPENSIVE: (os.cpu_count() or 2, 8)}
+# seconds after which an unused bucket is dropped; it has refilled by then,
+# so a new one is the same
+BUCKET_TTL = 600
+
+SLOW_DOWN = "Slow down {who}! Try again in {seconds:.0f}s."
+TOO_BUSY = "bytie is too busy for that right now, try again later."
+
+
+class _Lane:
+    "Bounded queue of one cost class, served round-robin between users."
+
+    def __init__(self, slots: int, limit: int):
+        self.slots = slots
+        self.limit = limit
+        self.running = 0
+        self.size = 0
+        self.users = OrderedDict()
+
+    def push(self, user, job):
+        self.users.setdefault(user, deque()).append(job)
+        self.size += 1
+
+    def pop(self):
+        user, jobs = next(iter(self.users.items()))
+        job = jobs.popleft()
+        del self.users[user]
+        if jobs:
+            # the user goes to the back of the line
+            self.users[user] = jobs
+        self.size -= 1
+        return job
+
+
+class Scheduler:
+    """
+    Admission control and fair scheduling in front of handler execution.
+
+    Every call takes a token from the caller's and the channel's bucket for
+    the handler's cost class, or is answered with a slow down message; a
+    handler that fired by chance only takes from the channel's. Cheap
+    calls then run at once. Normal and expensive calls wait in a bounded lane
+    of their class, which has its own worker slots and serves users
+    round-robin; when a lane is full new calls are shed.
+    """
+
+    def __init__(self, run, user_rates: dict = USER_RATES,
+                 channel_rates: dict = CHANNEL_RATES, lanes: dict = LANES,
+                 bucket_ttl: float = BUCKET_TTL):
+        # run(entry, argument) is the coroutine that executes a handler
+        self.run = run
+        self.user_rates = user_rates
+        self.channel_rates = channel_rates
+        self.lanes = {cost: _Lane(*lanes[cost]) for cost in lanes}
+        self.bucket_ttl = bucket_ttl
+        # least recently used first
+        self.buckets = OrderedDict()
+
+    def _bucket(self, kind: str, key, cost: str, rates: dict):
+        bucket = self.buckets.get((kind, key, cost))
+        if bucket is None:
+            self._evict_idle()
+            bucket = ratelimit.TokenBucket(*rates[cost])
+            self.buckets[(kind, key, cost)] = bucket
+        else:
+            self.buckets.move_to_end((kind, key, cost))
+        return bucket
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        while self.buckets:
+            bucket = next(iter(self.buckets.values()))
+            if now - bucket.updated < self.bucket_ttl:
+                break
+            self.buckets.popitem(last=False)
+
+    def _admit(self, cost: str, user, channel, by_chance: bool = False):
+        buckets = [("everyone", self._bucket("channel", channel, cost, self.channel_rates))]
+        if not by_chance:
+            buckets.insert(0, ("<@%s>" % user, self._bucket("user", user, cost, self.user_rates)))
+        # a call turned down by one bucket takes nothing from the other
+        for who, bucket in buckets:
+            seconds = bucket.delay()
+            if seconds > 0:
+                return SLOW_DOWN.format(who=who, seconds=max(1, seconds))
+        for _, bucket in buckets:
+            bucket.try_take()
+        return None
+
+    async def submit(self, entry: dict, argument: str, user=None, channel=None,
+                     by_chance: bool = False):
+        # by_chance: the handler fired on its probability, not on a command
+        cost = entry.get("cost", NORMAL)
+        rejection = self._admit(cost, user, channel, by_chance)
+        if rejection is not None:
+            metrics.scheduler_rejected.inc(cost, "rate")
+            return rejection
+
+        lane = self.lanes.get(cost)
+        if lane is None:
+            return await self.run(entry, argument)
+
+        if lane.size >= lane.limit:
+            metrics.scheduler_rejected.inc(cost, "full")
+            return TOO_BUSY
+
+        future = asyncio.get_running_loop().create_future()
+        lane.push(user, (entry, argument, future))
+        metrics.scheduler_queued.inc(cost)
+        self._pump(cost, lane)
+        return await future
+
+    def _pump(self, cost: str, lane: _Lane):
+        while lane.running < lane.slots and lane.size:
+            entry, argument, future = lane.pop()
+            metrics.scheduler_queued.dec(cost)
+            if future.cancelled():
+                continue
+            lane.running += 1
+            asyncio.create_task(self._execute(cost, lane, entry, argument, future))
+
+    async def _execute(self, cost: str, lane: _Lane, entry: dict, argument: str, future):
+        try:
+            result = await self.run(entry, argument)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+        finally:
+            lane.running -= 1
+            self._pump(cost, lane)
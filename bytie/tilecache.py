@@ -0,0 +1,243 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import mandelbrot
+except Exception:
+    from . import mandelbrot
+
+
+# render options at these values are left out of the tile key, so a view
+# asked for with or without them shares its tiles
+OPTION_DEFAULTS = {"method": "escape", "interior_check": False, "periodicity": False, "smooth": False}
+
+
+def _kind(max_iter, div_radius, dtype, options):
+    "Directory name of the tiles of one render setting; any option that may change a pixel is in it."
+    kind = f"{np.dtype(dtype).name}_{max_iter}_{div_radius!r}"
+    for name, value in sorted(options.items()):
+        if name in OPTION_DEFAULTS and value == OPTION_DEFAULTS[name]:
+            continue
+        kind += f"_{name}" if value is True else f"_{name}-{value}"
+    return kind
+
+
+class TileCache:
+    """
+    Iteration-count tiles of Mandelbrot views, stored on disk as .npy files
+    under root/<pixel size>/<dtype>_<max_iter>_<radius>[_<option>...]/<tx>_<ty>.npy,
+    where the options are the render options that are not at their default.
+
+    Every zoom level has its own pixel grid that starts at the origin. A view
+    is snapped to the grid of its level, so a pan or a return to an earlier
+    zoom reuses the tiles already computed and only the missing ones are
+    rendered. The least recently used tiles are deleted when the directory
+    grows past max_bytes.
+
+    The grid of zoom + 1 has half the step of the grid of zoom, so a quarter
+    of the pixels of a new tile are already known when the tile of the level
+    above is on disk; only the other three quarters are computed.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 256 * 1024 * 1024, tile: int = 64):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.tile = tile
+        self.lock = threading.Lock()
+        self.index = None
+        self.root_id = None
+        self.bytes = 0
+        self.computed = 0
+
+    def _root_id(self):
+        try:
+            st = os.stat(self.root)
+        except FileNotFoundError:
+            return None
+        return st.st_dev, st.st_ino
+
+    def _load_index(self):
+        # the index is read from disk again when the directory was removed
+        # (bytie clean temp!) or replaced since
+        root_id = self._root_id()
+        if self.index is not None and root_id == self.root_id:
+            return
+        self.root_id = root_id
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".npy"):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((st.st_mtime, path, st.st_size))
+        files.sort()
+        self.index = OrderedDict((path, size) for _, path, size in files)
+        self.bytes = sum(self.index.values())
+
+    def _path(self, level, tx, ty):
+        return os.path.join(self.root, *level, f"{tx}_{ty}.npy")
+
+    def _get(self, path):
+        with self.lock:
+            self._load_index()
+            if path not in self.index:
+                return None
+            self.index.move_to_end(path)
+        try:
+            tile = np.load(path)
+            os.utime(path)
+            return tile
+        except (FileNotFoundError, ValueError):
+            with self.lock:
+                self.bytes -= self.index.pop(path, 0)
+            return None
+
+    def _put(self, path, tile):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, tile)
+        os.replace(tmp, path)
+        size = os.path.getsize(path)
+        with self.lock:
+            self._load_index()
+            self.bytes += size - self.index.pop(path, 0)
+            self.index[path] = size
+            while self.bytes > self.max_bytes and len(self.index) > 1:
+                old, old_size = self.index.popitem(last=False)
+                self.bytes -= old_size
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+
+    def _tile_axes(self, step, tx, ty):
+        t = self.tile
+        x_range = (tx * t + np.arange(t)) * step
+        y_range = ((ty + 1) * t - 1 - np.arange(t)) * step
+        return x_range, y_range
+
+    def snap(self, zoom, center, shape=None):
+        """
+        Pixel size of the zoom level and the first pixel column i0 and row j0
+        of the view snapped to its grid; the view covers the points
+        (i0 + col) * step, (j0 + height - 1 - row) * step.
+        """
+        height, width = shape or mandelbrot.canvas_shape
+        extent = 2 / (2 ** zoom)
+        step = 2 * extent / (width - 1)
+        i0 = round(center[0] / step) - width // 2
+        j0 = round(center[1] / step) - height // 2
+        return step, i0, j0
+
+    def render(self, zoom, center, max_iter, div_radius, shape=None, dtype=np.complex128, workers=1, **options):
+        "Iteration counts of the view, assembled from cached and newly computed tiles."
+        shape = shape or mandelbrot.canvas_shape
+        height, width = shape
+        t = self.tile
+        step, i0, j0 = self.snap(zoom, center, shape)
+        kind = _kind(max_iter, div_radius, dtype, options)
+        level = (repr(step), kind)
+
+        tx0, tx1 = math.floor(i0 / t), math.floor((i0 + width - 1) / t)
+        ty0, ty1 = math.floor(j0 / t), math.floor((j0 + height - 1) / t)
+
+        canvas = np.empty(((ty1 - ty0 + 1) * t, (tx1 - tx0 + 1) * t), dtype=mandelbrot.result_dtype(options))
+        missing = []
+        for ty in range(ty0, ty1 + 1):
+            for tx in range(tx0, tx1 + 1):
+                path = self._path(level, tx, ty)
+                tile = self._get(path)
+                if tile is None:
+                    missing.append((tx, ty, path))
+                else:
+                    self._place(canvas, tile, tx - tx0, ty1 - ty)
+
+        seeds = [self._seed((repr(2 * step), kind), tx, ty) for tx, ty, _ in missing]
+        tiles = self._compute(missing, seeds, step, max_iter, div_radius, dtype, workers, options)
+        for (tx, ty, path), tile in zip(missing, tiles):
+            self._put(path, tile)
+            self._place(canvas, tile, tx - tx0, ty1 - ty)
+        self.computed += len(missing)
+
+        col = i0 - tx0 * t
+        row = (ty1 + 1) * t - 1 - (j0 + height - 1)
+        return canvas[row:row + height, col:col + width]
+
+    def _place(self, canvas, tile, col, row):
+        t = self.tile
+        canvas[row * t:(row + 1) * t, col * t:(col + 1) * t] = tile
+
+    def _seed(self, parent_level, tx, ty):
+        """
+        The pixels of tile tx, ty that its parent level has on disk, as a
+        (rows, cols, values) triple, or None.
+        """
+        t = self.tile
+        if t % 2:
+            return None
+        parent = self._get(self._path(parent_level, tx // 2, ty // 2))
+        if parent is None:
+            return None
+        # even pixel indices i = tx * t + col and j = (ty + 1) * t - 1 - row
+        # are the pixels i / 2, j / 2 of the parent level
+        rows, cols = np.mgrid[1:t:2, 0:t:2]
+        i = (tx * t + cols) // 2 - (tx // 2) * t
+        j = ((ty + 1) * t - 1 - rows) // 2
+        return rows, cols, parent[(ty // 2 + 1) * t - 1 - j, i]
+
+    def _compute(self, missing, seeds, step, max_iter, div_radius, dtype, workers, options):
+        jobs = [self._tile_axes(step, tx, ty) + (seed,) for (tx, ty, _), seed in zip(missing, seeds)]
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(jobs) < 2:
+            return _render_tiles(jobs, max_iter, div_radius, dtype, options)
+        # a few batches per worker, so the cheap ones do not leave workers idle
+        size = max(1, len(jobs) // (4 * workers))
+        with mandelbrot.worker_pool(workers) as pool:
+            futures = [pool.submit(_render_tiles, jobs[i:i + size], max_iter, div_radius, dtype, options)
+                       for i in range(0, len(jobs), size)]
+            return [tile for future in futures for tile in future.result()]
+
+
+def _render_tiles(jobs, max_iter, div_radius, dtype, options):
+    """
+    Tiles for a list of (x_range, y_range, seed) jobs. All the pixels that
+    are not in a seed go through one kernel call, which is much faster than a
+    call per tile.
+    """
+    if not jobs:
+        return []
+    if options.get("method", "escape") != "escape":
+        return [mandelbrot.render_grid(x_range, y_range, max_iter, div_radius, dtype=dtype, **options)
+                for x_range, y_range, _ in jobs]
+
+    tiles, masks, real, cmplx = [], [], [], []
+    for x_range, y_range, seed in jobs:
+        tile = np.empty((len(y_range), len(x_range)), dtype=mandelbrot.result_dtype(options))
+        todo = np.ones(tile.shape, dtype=bool)
+        if seed is not None:
+            rows, cols, values = seed
+            tile[rows, cols] = values
+            todo[rows, cols] = False
+        x, y = np.meshgrid(x_range, y_range)
+        tiles.append(tile)
+        masks.append(todo)
+        real.append(x[todo])
+        cmplx.append(y[todo])
+
+    kernel_options = {k: v for k, v in options.items() if k != "method"}
+    values = mandelbrot.mandel_iter((np.concatenate(real), np.concatenate(cmplx)), max_iter, div_radius,
+                                    dtype=dtype, **kernel_options)
+    start = 0
+    for tile, todo in zip(tiles, masks):
+        count = int(todo.sum())
+        tile[todo] = values[start:start + count]
+        start += count
+    return tiles
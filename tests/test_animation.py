@@ -0,0 +1,52 @@
+import io
+from unittest import TestCase, main
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from bytie import animation
+from bytie.mandelbrot import HOT
+
+
+def frames(n):
+    base = np.add.outer(np.arange(30), np.arange(40))
+    return [(base * k % 256).astype(np.uint8) for k in range(1, n + 1)]
+
+
+class TestWriters(TestCase):
+
+    def check(self, data, expected, format):
+        image = Image.open(io.BytesIO(data))
+        self.assertEqual(image.format, format)
+        self.assertEqual(image.n_frames, len(expected))
+        self.assertEqual(image.info["duration"], 50)
+        for frame, indices in zip(ImageSequence.Iterator(image), expected):
+            np.testing.assert_array_equal(np.asarray(frame.convert("RGB")), HOT[indices])
+
+    def test_gif(self):
+        out = io.BytesIO()
+        writer = animation.GifWriter(out, (40, 30), HOT, delay_ms=50)
+        for frame in frames(3):
+            writer.add(frame)
+        writer.close()
+        self.check(out.getvalue(), frames(3), "GIF")
+
+    def test_apng(self):
+        out = io.BytesIO()
+        writer = animation.ApngWriter(out, (40, 30), 3, HOT, delay_ms=50)
+        for frame in frames(3):
+            writer.add(frame)
+        writer.close()
+        self.check(out.getvalue(), frames(3), "PNG")
+
+    def test_apng_frame_count(self):
+        writer = animation.ApngWriter(io.BytesIO(), (40, 30), 2, HOT)
+        writer.add(frames(1)[0])
+        with self.assertRaises(ValueError):
+            writer.close()
+        with self.assertRaises(ValueError):
+            writer.add(np.zeros((10, 10), dtype=np.uint8))
+
+
+if __name__ == '__main__':
+    main()
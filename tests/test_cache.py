@@ -0,0 +1,78 @@
+import time
+from unittest import TestCase, main
+
+from bytie.cache import TTLCache, cached
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(TestCase):
+
+    def test_ttl_and_stale(self):
+        clock = FakeClock()
+        cache = TTLCache(ttl=10, stale_ttl=5, clock=clock)
+        cache.set("k", "v")
+        self.assertEqual(cache.get("k"), (True, "v", True))
+        clock.now = 12
+        self.assertEqual(cache.get("k"), (True, "v", False))
+        clock.now = 16
+        self.assertEqual(cache.get("k"), (False, None, False))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        cache = TTLCache(ttl=10, maxsize=2, maxbytes=10)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        self.assertEqual(list(cache.data), ["a", "c"])
+        cache.set("d", "123456789")
+        self.assertEqual(list(cache.data), ["c", "d"])
+        self.assertEqual(cache.bytes, 10)
+        cache.set("e", "x" * 11)
+        self.assertNotIn("e", cache.data)
+
+
+class TestCached(TestCase):
+
+    def test_key_and_none(self):
+        calls = []
+
+        @cached(ttl=60, key=lambda word: word.strip())
+        def lookup(word):
+            calls.append(word)
+            return None if word.strip() == "yok" else word.strip().upper()
+
+        self.assertEqual(lookup("kalem"), "KALEM")
+        self.assertEqual(lookup(" kalem "), "KALEM")
+        self.assertIsNone(lookup("yok"))
+        self.assertIsNone(lookup("yok"))
+        self.assertEqual(calls, ["kalem", "yok", "yok"])
+
+    def test_stale_while_revalidate(self):
+        values = iter(["old", "new"])
+        clock = FakeClock()
+
+        @cached(ttl=60, stale_while_revalidate=60)
+        def rates():
+            return next(values)
+
+        rates.cache.clock = clock
+        self.assertEqual(rates(), "old")
+        clock.now = 90
+        self.assertEqual(rates(), "old")
+        for _ in range(500):
+            if rates.cache.data[()][0] == "new":
+                break
+            time.sleep(0.01)
+        self.assertEqual(rates(), "new")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+from unittest.mock import patch
+from unittest import TestCase, main
+
+from bytie.dispatch import CommandIndex
+
+
+def entry(name, prefix=True, probability=0.0):
+    return {"name": name, "prefix": prefix, "probability": probability}
+
+
+class TestCommandIndex(TestCase):
+
+    def setUp(self):
+        self.index = CommandIndex()
+        self.fft = entry("fft")
+        self.fft_help = entry("fft?", prefix=False)
+        self.weather = entry("bytie weather")
+        self.random = entry("iplikisyin", probability=0.5)
+        for e in [self.fft, self.fft_help, self.random, self.weather]:
+            self.index.add(e)
+
+    @patch("random.random", return_value=0.9)
+    def test_prefix_and_exact(self, _):
+        self.assertEqual(self.index.match("fft 1 2 3"), [(self.fft, "1 2 3")])
+        self.assertEqual(self.index.match("fft?"), [(self.fft_help, "")])
+        self.assertEqual(self.index.match("fft? now"), [])
+        self.assertEqual(
+            self.index.match("bytie weather Izmir"), [(self.weather, "Izmir")])
+
+    @patch("random.random", return_value=0.9)
+    def test_non_command(self, _):
+        self.assertEqual(self.index.match("fftx"), [])
+        self.assertEqual(self.index.match("hello there"), [])
+
+    @patch("random.random", return_value=0.1)
+    def test_probability_in_registration_order(self, _):
+        self.assertEqual(
+            self.index.match("bytie weather Ankara"),
+            [(self.random, "bytie weather Ankara"), (self.weather, "Ankara")])
+        self.assertEqual(
+            self.index.match("iplikisyin abc"), [(self.random, "abc")])
+
+
+if __name__ == '__main__':
+    main()
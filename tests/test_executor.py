@@ -0,0 +1,83 @@
+import asyncio
+import os
+import threading
+import time
+from unittest import TestCase, main
+
+from concurrent.futures.process import BrokenProcessPool
+
+from bytie.executor import HandlerExecutor
+
+
+def invoke(func, argument):
+    try:
+        return func(argument)
+    except Exception as e:
+        return "error: " + str(e)
+
+
+def shout(message):
+    return message.upper()
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def crash(message):
+    os._exit(1)
+
+
+class TestHandlerExecutor(TestCase):
+
+    def setUp(self):
+        self.executor = HandlerExecutor(invoke, threads=4, processes=2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def run_entries(self, *calls):
+        async def go():
+            return await asyncio.gather(
+                *[self.executor.run(entry, arg) for entry, arg in calls])
+        return asyncio.run(go())
+
+    def test_modes(self):
+        inline = {"name": "a", "function": shout, "executor": None}
+        thread = {"name": "b", "function": shout, "executor": "thread"}
+        process = {"name": "c", "function": shout, "executor": "process"}
+        broken = {"name": "d", "function": fail, "executor": "process"}
+        self.assertEqual(
+            self.run_entries((inline, "x"), (thread, "y"), (process, "z"), (broken, "w")),
+            ["X", "Y", "Z", "error: w"])
+
+    def test_broken_process_pool(self):
+        crashing = {"name": "e", "function": crash, "executor": "process"}
+        process = {"name": "c", "function": shout, "executor": "process"}
+        with self.assertRaises(BrokenProcessPool):
+            self.run_entries((crashing, "x"))
+        self.assertEqual(self.run_entries((process, "z")), ["Z"])
+
+    def test_concurrency_is_bounded(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow(message):
+            with lock:
+                running.append(message)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(message)
+            return message
+
+        entry = {"name": "slow", "function": slow,
+                 "executor": "thread", "concurrency": 2}
+        result = self.run_entries(*[(entry, str(i)) for i in range(6)])
+        self.assertEqual(result, [str(i) for i in range(6)])
+        self.assertEqual(max(peak), 2)
+
+
+if __name__ == '__main__':
+    main()
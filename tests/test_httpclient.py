@@ -0,0 +1,70 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase, main
+
+import bytie.messagehandle
+from bytie.httpclient import HttpClient, ResponseTooLarge
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    routes = {
+        "/614/info.0.json": json.dumps({"num": 614, "img": "https://imgs.xkcd.com/614.png"}),
+        "/big": "x" * 4096,
+    }
+
+    def do_GET(self):
+        self.server.peers.add(self.client_address)
+        body = self.routes.get(self.path)
+        status = 200 if body is not None else 404
+        data = (body or "").encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpClient(TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.peers = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.client = HttpClient(max_bytes=1024, hosts={"https://xkcd.com": base})
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        for _ in range(3):
+            r = self.client.get("https://xkcd.com/614/info.0.json")
+            self.assertEqual(r.json()["num"], 614)
+        self.assertEqual(len(self.server.peers), 1)
+
+    def test_size_cap(self):
+        with self.assertRaises(ResponseTooLarge):
+            self.client.get("https://xkcd.com/big")
+
+    def test_handler_against_stub(self):
+        httpclient = bytie.messagehandle.httpclient
+        old = httpclient.use(self.client)
+        try:
+            self.assertEqual(
+                bytie.messagehandle.bytie_handle_xkcd(614),
+                "https://imgs.xkcd.com/614.png")
+            self.assertIn(
+                "xkcd 615 does not exist",
+                bytie.messagehandle.bytie_handle_xkcd(615))
+        finally:
+            httpclient.use(old)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+from unittest import TestCase, main
+
+import numpy as np
+
+from bytie import lambada
+
+
+def lex(source):
+    return [(t.type, t.content) for t in lambada.Lexer(source).tokens()]
+
+
+class TestLexer(TestCase):
+
+    def test_tokens_and_positions(self):
+        tokens = list(lambada.Lexer('(+ 12 x_1)').tokens())
+        self.assertEqual([(t.type, t.content, t.pos) for t in tokens], [
+            (lambada.TOKEN_LEFT_PARANT, "(", 0),
+            (lambada.TOKEN_PLUS, "+", 1),
+            (lambada.TOKEN_CONSTANT_NUMBER, 12, 3),
+            (lambada.TOKEN_IDENTIFIER, "x_1", 6),
+            (lambada.TOKEN_RIGHT_PARANT, ")", 9),
+            (lambada.TOKEN_EOF, "-EOF-", 10),
+        ])
+
+    def test_numbers(self):
+        self.assertEqual(lex("-5 2.5 1e3 - 4")[:-1], [
+            (lambada.TOKEN_CONSTANT_NUMBER, -5),
+            (lambada.TOKEN_CONSTANT_NUMBER, 2.5),
+            (lambada.TOKEN_CONSTANT_NUMBER, 1000.0),
+            (lambada.TOKEN_MINUS, "-"),
+            (lambada.TOKEN_CONSTANT_NUMBER, 4),
+        ])
+
+    def test_strings(self):
+        self.assertEqual(lex(r'"say \"hi\"\n" "plain"')[:-1], [
+            (lambada.TOKEN_CONSTANT_STRING, 'say "hi"\n'),
+            (lambada.TOKEN_CONSTANT_STRING, "plain"),
+        ])
+
+    def test_errors_have_locations(self):
+        with self.assertRaises(lambada.LexError) as cm:
+            lex("(list 1\n  2 ?)")
+        self.assertEqual((cm.exception.line, cm.exception.column), (2, 5))
+        with self.assertRaisesRegex(lambada.LexError, "Unterminated string at line 1, column 4"):
+            lex('(+ "abc')
+
+    def test_long_whitespace(self):
+        self.assertEqual(lex("(+ 1 2" + " " * 100000 + ")")[-2][0], lambada.TOKEN_RIGHT_PARANT)
+
+
+class TestInterpreter(TestCase):
+
+    def setUp(self):
+        self.interpreter = lambada.Interpreter()
+
+    def run_code(self, code):
+        return self.interpreter.interprete(code)
+
+    def test_arithmetic(self):
+        self.assertEqual(self.run_code("(+ 1 (* 2 3))"), 7)
+        self.assertEqual(self.run_code("(- -5 3)"), -8)
+        self.assertEqual(self.run_code("(^ 2 10)"), 1024)
+        self.assertEqual(self.run_code('"hello"'), "hello")
+
+    def test_functions(self):
+        self.run_code("(def sq (fn (list x) (* x x)))")
+        self.assertEqual(self.run_code("(funcall sq (list 12))"), 144)
+        self.run_code("(def fib (fn (list n) (ifelse (= n 0) 0 (ifelse (= n 1) 1 "
+                      "(+ (funcall fib (list (- n 1))) (funcall fib (list (- n 2))))))))")
+        self.assertEqual(self.run_code("(funcall fib (list 15))"), 610)
+
+    def test_lists(self):
+        self.assertEqual(self.run_code("(length (list 1 2 3))"), 3)
+        # = compares whole vectors
+        self.assertEqual(self.run_code("(ifelse (= (list 1 2) (list 1 2)) 1 0)"), 1)
+        self.assertIs(self.run_code("(= (list 1 2) (list 1 2 3))"), False)
+
+    def test_compiled_matches_eval(self):
+        self.run_code("(def k 3)")
+        self.run_code("(def add (fn (list a b) (+ a b)))")
+        for code in ["(- k 1)", "(- 10 k)", "(* k k)", "(/ (+ k 1) 2)", "(= k 3)",
+                     "(ifelse (= k 2) 1 (list k 2))", "(funcall add (list k (^ 2 k)))",
+                     "(length (list 1 k))", '"text"']:
+            expr = lambada.Parser(code).parseNextExpression()
+            np.testing.assert_equal(expr.compile(lambada.Scope(self.interpreter.env))(None), expr.eval(self.interpreter.env), code)
+
+    def test_deep_recursion(self):
+        self.run_code("(def count (fn (list n) (ifelse (= n 0) 0 (+ 1 (funcall count (list (- n 1)))))))")
+        self.assertEqual(self.run_code("(funcall count (list 20000))"), 20000)
+        self.run_code("(def build (fn (list n) (ifelse (= n 0) (list) (list n (funcall build (list (- n 1)))))))")
+        self.assertEqual(self.run_code("(length (funcall build (list 5000)))"), 2)
+
+    def test_tail_calls(self):
+        self.run_code("(def loop (fn (list acc n) (ifelse (= n 0) acc (funcall loop (list (+ acc n) (- n 1))))))")
+        self.assertEqual(self.run_code("(funcall loop (list 0 100000))"), 5000050000)
+        self.run_code("(def even (fn (list n) (ifelse (= n 0) 1 (funcall odd (list (- n 1))))))")
+        self.run_code("(def odd (fn (list n) (ifelse (= n 0) 0 (funcall even (list (- n 1))))))")
+        self.assertEqual(self.run_code("(funcall even (list 20001))"), 0)
+
+    def test_call_limit(self):
+        interpreter = lambada.Interpreter(max_calls=100000)
+        interpreter.interprete("(def loop (fn (list) (funcall loop (list))))")
+        with self.assertRaises(lambada.CallLimit):
+            interpreter.interprete("(funcall loop (list))")
+        interpreter.interprete("(def deep (fn (list n) (+ 1 (funcall deep (list n)))))")
+        with self.assertRaises(lambada.CallLimit):
+            interpreter.interprete("(funcall deep (list 1))")
+        # the budget is per program
+        interpreter.interprete("(def count (fn (list n) (ifelse (= n 0) 0 (+ 1 (funcall count (list (- n 1)))))))")
+        self.assertEqual(interpreter.interprete("(funcall count (list 60000))"), 60000)
+        self.assertEqual(interpreter.interprete("(funcall count (list 60000))"), 60000)
+
+    def test_closures(self):
+        self.run_code("(def adder (fn (list n) (fn (list x) (+ x n))))")
+        self.run_code("(def add5 (funcall adder (list 5)))")
+        self.run_code("(def add7 (funcall adder (list 7)))")
+        self.assertEqual(self.run_code("(list (funcall add5 (list 10)) (funcall add7 (list 10)))").tolist(), [15, 17])
+        self.run_code("(def mk (fn (list a) (fn (list b) (fn (list c) (list a b c)))))")
+        self.run_code("(def f (funcall (funcall mk (list 1)) (list 2)))")
+        self.assertEqual(self.run_code("(funcall f (list 3))").tolist(), [1, 2, 3])
+
+    def test_deeply_nested_body(self):
+        # too deep for one Python expression, the body stays closures
+        for depth in (10, 300):
+            self.run_code("(def f (fn (list n) %s))" % ("(+ 1 " * depth + "n" + ")" * depth))
+            self.assertEqual(self.run_code("(funcall f (list 1))"), depth + 1)
+
+    def test_lexical_scope(self):
+        self.run_code("(def k 1)")
+        self.run_code("(def getk (fn (list) k))")
+        self.run_code("(def f (fn (list k) (funcall getk (list))))")
+        self.assertEqual(self.run_code("(funcall f (list 2))"), 1)
+        # arguments are evaluated in the caller, not in the new frame
+        self.run_code("(def swap (fn (list a b) (list b a)))")
+        self.run_code("(def g (fn (list a b) (funcall swap (list b a))))")
+        self.assertEqual(self.run_code("(funcall g (list 1 2))").tolist(), [1, 2])
+        # def binds a global, also inside a function
+        self.run_code("(def setk (fn (list v) (def k v)))")
+        self.run_code("(funcall setk (list 9))")
+        self.assertEqual(self.run_code("k"), 9)
+
+    def test_arity(self):
+        self.run_code("(def sq (fn (list x) (* x x)))")
+        with self.assertRaises(TypeError):
+            self.run_code("(funcall sq (list 1 2))")
+
+    def test_program_cache(self):
+        interpreter = lambada.Interpreter(cache_size=2)
+        interpreter.interprete("(def n 1)")
+        interpreter.interprete("(def n (+ n 1))")
+        interpreter.interprete("(def n (+ n 1))")
+        self.assertEqual(interpreter.interprete("n"), 3)
+        self.assertEqual((interpreter.hits, interpreter.misses), (1, 3))
+        # the least recently used program is dropped
+        self.assertEqual(list(interpreter.cache), ["(def n (+ n 1))", "n"])
+        with self.assertRaises(lambada.LexError):
+            interpreter.interprete("(% 1 2)")
+        self.assertEqual(len(interpreter.cache), 2)
+
+    def test_program_cache_chars(self):
+        interpreter = lambada.Interpreter(cache_chars=20)
+        interpreter.interprete("(+ 1 2)")
+        interpreter.interprete("(+ 10 20)")
+        interpreter.interprete("(+ 100 200)")
+        self.assertEqual(list(interpreter.cache), ["(+ 10 20)", "(+ 100 200)"])
+        self.assertEqual(interpreter.cached_chars, 20)
+        # too long to be cached at all
+        self.assertEqual(interpreter.interprete("(+ 1000000 2000000000)"), 2001000000)
+        self.assertEqual(list(interpreter.cache), ["(+ 10 20)", "(+ 100 200)"])
+
+    def test_vectors(self):
+        v = self.run_code("(list 1 2 3)")
+        self.assertIsInstance(v, np.ndarray)
+        self.assertFalse(v.flags.writeable)
+        np.testing.assert_equal(self.run_code("(+ (list 1 2 3) 1)"), [2, 3, 4])
+        np.testing.assert_equal(self.run_code("(* (list 1 2 3) (list 2 2 2))"), [2, 4, 6])
+        np.testing.assert_equal(self.run_code("(^ 2 (list 1 2 3))"), [2, 4, 8])
+        np.testing.assert_equal(self.run_code("(def k 2) (/ (list k 4) k)"), [1.0, 2.0])
+        self.assertEqual(self.run_code("(length (list 1 2 3))"), 3)
+        # = compares whole vectors
+        self.assertEqual(self.run_code("(ifelse (= (list 1 2) (list 1 2)) 1 0)"), 1)
+        self.assertIs(self.run_code("(= (list 1 2) (list 1 2 3))"), False)
+        # anything but numbers stays a list
+        self.assertEqual(self.run_code('(list 1 "a")'), [1, "a"])
+        self.assertEqual(self.run_code("(list (= 1 1) 2)"), [True, 2])
+        self.assertEqual(self.run_code("(list 100000000000000000000000)"), [100000000000000000000000])
+        self.assertEqual(self.run_code("(list)"), [])
+
+    def test_python_functions(self):
+        self.interpreter.addvar("total", lambada.PythonFunctionExpression(sum))
+        self.assertEqual(self.run_code("(py total (list 1 2 3))"), 6)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase, main
+
+from bytie import lazy
+
+BYTIE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bytie")
+
+
+class TestLazy(TestCase):
+
+    def test_imported_on_first_use(self):
+        sys.modules.pop("colorsys", None)
+        colorsys = lazy.LazyModule("colorsys")
+        self.assertNotIn("colorsys", sys.modules)
+        self.assertEqual(colorsys.rgb_to_hsv(1, 0, 0), (0, 1, 1))
+        self.assertIn("colorsys", sys.modules)
+        self.assertIn("colorsys", lazy.import_times)
+
+    def test_messagehandle_does_not_import_heavy_modules(self):
+        code = (
+            "import sys; sys.path.insert(0, %r); import messagehandle; "
+            "print(sorted(m for m in ('numpy', 'pandas', 'matplotlib', 'bs4', 'yfinance') if m in sys.modules))"
+        ) % BYTIE
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip().splitlines()[-1], "[]")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+import io
+import os
+from concurrent.futures.process import BrokenProcessPool
+from unittest import TestCase, main
+
+import numpy as np
+from PIL import Image
+
+from bytie import mandelbrot
+
+
+def escape_time(c, max_iter, radius):
+    z = 0j
+    for idx in range(max_iter):
+        z = z * z + c
+        if z.real ** 2 + z.imag ** 2 >= radius:
+            return max(idx - 1, 0)
+    return max_iter - 1
+
+
+def grid(center, extent, n):
+    xs = np.linspace(center[0] - extent, center[0] + extent, n)
+    ys = np.linspace(center[1] - extent, center[1] + extent, n)
+    return np.meshgrid(xs, ys[::-1])
+
+
+def crash():
+    os._exit(1)
+
+
+class TestMandelIter(TestCase):
+
+    def test_matches_scalar_iteration(self):
+        real, imag = grid((-0.5, 0), 1.5, 41)
+        result = mandelbrot.mandel_iter((real, imag), 100, 4)
+        expected = np.vectorize(lambda r, i: escape_time(complex(r, i), 100, 4))(real, imag)
+        np.testing.assert_array_equal(result, expected)
+
+    def test_deep_iterations_do_not_wrap(self):
+        real, imag = grid((-0.7436, 0.1318), 0.002, 24)
+        result = mandelbrot.mandel_iter((real, imag), 3000, 4)
+        self.assertGreater(result.max(), 255)
+        self.assertLess(result.max(), 3000)
+
+    def test_single_precision(self):
+        real, imag = grid((-0.5, 0), 1.5, 41)
+        double = mandelbrot.mandel_iter((real, imag), 50, 4)
+        single = mandelbrot.mandel_iter((real, imag), 50, 4, dtype=np.complex64)
+        self.assertLess(np.mean(double != single), 0.02)
+
+    def test_main_bulbs(self):
+        inside = mandelbrot.in_main_bulbs(np.array([0.0, -1.0, 0.25, -0.1, 0.3, -1.3]),
+                                          np.array([0.0, 0.0, 0.0, 0.6, 0.0, 0.0]))
+        self.assertEqual(inside.tolist(), [True, True, True, True, False, False])
+
+    def test_interior_check_and_periodicity(self):
+        real, imag = grid((-0.5, 0), 1.5, 61)
+        expected = mandelbrot.mandel_iter((real, imag), 300, 4)
+        result = mandelbrot.mandel_iter((real, imag), 300, 4, interior_check=True, periodicity=True)
+        np.testing.assert_array_equal(result, expected)
+
+    def test_interior_check_with_small_radius(self):
+        # with a radius under 4 points of the bulbs escape, the check must not
+        # keep them in the set
+        real, imag = grid((-0.5, 0), 1.5, 41)
+        expected = mandelbrot.mandel_iter((real, imag), 100, 1)
+        result = mandelbrot.mandel_iter((real, imag), 100, 1, interior_check=True)
+        np.testing.assert_array_equal(result, expected)
+
+    def test_smooth_stays_near_the_counts(self):
+        real, imag = grid((-0.5, 0), 1.5, 41)
+        counts = mandelbrot.mandel_iter((real, imag), 100, 4)
+        smooth = mandelbrot.mandel_iter((real, imag), 100, 4, smooth=True)
+        self.assertEqual(smooth.dtype, np.float32)
+        self.assertTrue(np.all(smooth >= counts))
+        self.assertTrue(np.all(smooth <= counts + 1))
+
+
+class TestMarianiSilver(TestCase):
+
+    def test_same_as_escape_time(self):
+        x_range, y_range = mandelbrot.view_axes(1, (-0.5, 0), (67, 93))
+        expected = mandelbrot.render_grid(x_range, y_range, 100, 4)
+        result = mandelbrot.render_grid(x_range, y_range, 100, 4, method="mariani", min_size=4)
+        np.testing.assert_array_equal(result, expected)
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            mandelbrot.render_grid(np.zeros(2), np.zeros(2), 10, 4, method="magic")
+
+
+class TestRenderTiled(TestCase):
+
+    def test_same_as_one_pass(self):
+        x_range, y_range = mandelbrot.view_axes(1, (-0.5, 0), (70, 90))
+        real, imag = np.meshgrid(x_range, y_range)
+        expected = mandelbrot.mandel_iter((real, imag), 80, 4)
+        result = mandelbrot.render_tiled(x_range, y_range, 80, 4, workers=2, tile=32)
+        np.testing.assert_array_equal(result, expected)
+
+    def test_options_reach_the_workers(self):
+        x_range, y_range = mandelbrot.view_axes(1, (-0.5, 0), (40, 40))
+        expected = mandelbrot.render_grid(x_range, y_range, 80, 4)
+        result = mandelbrot.render_tiled(x_range, y_range, 80, 4, workers=2, tile=16,
+                                         method="mariani", periodicity=True)
+        np.testing.assert_array_equal(result, expected)
+
+    def test_broken_pool_is_replaced(self):
+        with self.assertRaises(BrokenProcessPool):
+            with mandelbrot.worker_pool(2) as pool:
+                pool.submit(crash).result()
+        self.assertIsNot(mandelbrot.get_pool(2), pool)
+        x_range, y_range = mandelbrot.view_axes(1, (-0.5, 0), (40, 40))
+        result = mandelbrot.render_tiled(x_range, y_range, 80, 4, workers=2, tile=16)
+        np.testing.assert_array_equal(result, mandelbrot.render_grid(x_range, y_range, 80, 4))
+
+
+class TestPerturbation(TestCase):
+    center = ("-0.743643887037158704752191506114774", "0.131825904205311970493132056385139")
+
+    def test_matches_direct_render(self):
+        x_range, y_range = mandelbrot.view_axes(8, (-0.7436, 0.1318), (40, 40))
+        expected = mandelbrot.render_grid(x_range, y_range, 500, 4)
+        result = mandelbrot.perturbation(8, ("-0.7436", "0.1318"), 500, 4, shape=(40, 40))
+        self.assertGreater(np.mean(result == expected), 0.99)
+
+    def test_reference_orbit_stops_at_escape(self):
+        self.assertEqual(len(mandelbrot.reference_orbit(("1", "0"), 1, 100, 4)), 3)
+        self.assertEqual(len(mandelbrot.reference_orbit(("-1", "0"), 1, 100, 4)), 101)
+
+    def test_beyond_float64(self):
+        x_range, _ = mandelbrot.view_axes(60, (float(self.center[0]), 0), (20, 20))
+        self.assertEqual(len(np.unique(x_range)), 1)
+        result = mandelbrot.perturbation(60, self.center, 12000, 4, shape=(20, 20), workers=2, tile=8)
+        self.assertGreater(len(np.unique(result)), 50)
+
+
+class TestInterestingRegions(TestCase):
+
+    def test_ranked_regions_inside_the_view(self):
+        regions = mandelbrot.interesting_regions(0.5, (-0.5, 0), samples=32, cells=4, count=3)
+        self.assertEqual(len(regions), 3)
+        scores = [score for _, _, _, score in regions]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        extent = 2 / 2 ** 0.5
+        for x, y, zoom, _ in regions:
+            self.assertEqual(zoom, 2.5)
+            self.assertLess(abs(float(x) + 0.5), extent)
+            self.assertLess(abs(float(y)), extent)
+
+    def test_nothing_far_from_the_set(self):
+        self.assertEqual(mandelbrot.interesting_regions(3, (5, 5)), [])
+
+    def test_nothing_inside_the_cardioid(self):
+        self.assertEqual(mandelbrot.interesting_regions(6, (-0.1, 0)), [])
+
+
+class TestPng(TestCase):
+
+    def test_hot_colormap_ends(self):
+        self.assertEqual(mandelbrot.HOT[0].tolist(), [11, 0, 0])
+        self.assertEqual(mandelbrot.HOT[-1].tolist(), [255, 255, 255])
+
+    def test_colorize_scales_to_the_range(self):
+        rgb = mandelbrot.colorize(np.array([[10, 20], [30, 30]]))
+        self.assertEqual(rgb.shape, (2, 2, 3))
+        self.assertEqual(rgb[0, 0].tolist(), mandelbrot.HOT[0].tolist())
+        self.assertEqual(rgb[1, 1].tolist(), mandelbrot.HOT[-1].tolist())
+        flat = mandelbrot.colorize(np.full((2, 2), 7))
+        self.assertTrue(np.all(flat == mandelbrot.HOT[0]))
+
+    def test_png_bytes(self):
+        data = mandelbrot.mandelbrot(zoom=1, center=(-0.5, 0), filename=None, max_iter=50,
+                                     workers=1, shape=(30, 40), smooth=True)
+        image = Image.open(io.BytesIO(data))
+        self.assertEqual(image.format, "PNG")
+        self.assertEqual(image.size, (40, 30))
+        self.assertEqual(image.mode, "RGB")
+
+
+class TestZoomAnimation(TestCase):
+
+    def test_frames(self):
+        data = mandelbrot.zoom_animation((-0.7436, 0.1318), 1, 3, frames=7, max_iter=60, size=32, workers=1)
+        image = Image.open(io.BytesIO(data))
+        self.assertEqual((image.format, image.n_frames, image.size), ("GIF", 7, (32, 32)))
+
+    def test_first_frame_is_the_view(self):
+        data = mandelbrot.zoom_animation((-0.5, 0), 1, 2, frames=2, format="png", max_iter=60, size=32,
+                                         workers=1)
+        first = np.asarray(Image.open(io.BytesIO(data)).convert("RGB"), dtype=float)
+        x_range, y_range = mandelbrot.view_axes(1, (-0.5, 0), (32, 32))
+        view = mandelbrot.colorize(mandelbrot.render_grid(x_range, y_range, 60, 4), lo=0, hi=59)
+        self.assertLess(np.mean(np.abs(first - view)), 20)
+
+
+if __name__ == '__main__':
+    main()
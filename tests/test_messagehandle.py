@@ -19,6 +19,22 @@ class TestMessageHandler(TestCase):
             bytie.messagehandle.bytie_handle_ast(cmd),
             "Module(body=[Expr(value=Constant(value=4))], type_ignores=[])")
 
+    def test_lambada_vectors(self):
+        lambada = bytie.messagehandle.bytie_lambada_command
+        self.assertEqual(lambada("(+ (list 1 2 3) 1)"), "[2 3 4]")
+        self.assertEqual(lambada("(length (py random (list 5)))"), 5)
+
+    def test_mandelbrot_bounds(self):
+        mandel = bytie.messagehandle.bytie_handle_mandelbrot
+        self.assertEqual(mandel("-0.5 0 1 1000000 4"), "Sorry, iterations must be between 1 and 100000.")
+        self.assertEqual(mandel("-0.5 0 1e9 200 4"), "Sorry, zoom must be between 0 and 1000.")
+        self.assertEqual(mandel("-0.5 0 1 200 nan"), "Sorry, divergence radius must be a positive number.")
+
+    def test_mandelzoom_bounds(self):
+        zoom = bytie.messagehandle.bytie_handle_mandelzoom
+        self.assertEqual(zoom("-0.5 0 1 5000 10"), "Sorry, zoom must be between 0 and 1000.")
+        self.assertEqual(zoom("-0.5 0 1 2 10 0"), "Sorry, iterations must be between 1 and 100000.")
+
     def test_iplikisyin(self):
         content = "Ama Java'da Multiple Inheritance yok ki"
         result = bytie.messagehandle.bytie_handle_iplikisyin(content)
@@ -26,7 +42,7 @@ class TestMessageHandler(TestCase):
         oplokosyon = "omo jovo'do moltoplo onhorotonco yok ko :rofl:"
         self.assertIn(result, [iplikisyin, oplokosyon])
 
-    @patch('requests.get')
+    @patch('bytie.messagehandle.httpclient.get')
     def test_dadjoke_success(self, mock_requests_get):
         mock_requests_get.return_value.status_code = 200
         mock_requests_get.return_value.json.return_value = {
@@ -35,13 +51,31 @@ class TestMessageHandler(TestCase):
             bytie.messagehandle.bytie_handle_dadjoke(""),
             "https://icanhazdadjoke.com/j/12345678.png")
 
-    @patch('requests.get')
+    @patch('bytie.messagehandle.httpclient.get')
     def test_dadjoke_fail(self, mock_requests_get):
         mock_requests_get.return_value.status_code = 400
         self.assertEqual(
             bytie.messagehandle.bytie_handle_dadjoke(""),
             "Couldn't get a dadjoke :(")
 
+    @patch('random.random', return_value=0.9)
+    def test_handle_string(self, _):
+        self.assertEqual(
+            bytie.messagehandle.handle_string("hey bytie!"), "Yes, sir!")
+        self.assertEqual(
+            bytie.messagehandle.handle_string("python"),
+            bytie.messagehandle.bytie_handle_python(""))
+        self.assertIsNone(
+            bytie.messagehandle.handle_string("just chatting"))
+
+    @patch('random.random', return_value=0.9)
+    def test_pipe(self, _):
+        pipe = bytie.messagehandle.bytie_pipe
+        self.assertEqual(pipe("hey bytie! |> split ,"), "Yes\n sir!")
+        self.assertEqual(pipe("lambada (+ 1 2)"), 3)
+        with self.assertRaises(ValueError):
+            pipe("stonks AAPL")
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,55 @@
+from unittest import TestCase, main
+
+import requests
+
+import bytie.messagehandle
+from bytie.metrics import Counter, Histogram, Registry, start_http_server
+
+
+class TestMetrics(TestCase):
+
+    def test_render(self):
+        registry = Registry()
+        calls = registry.register(Counter("calls_total", "Calls.", ["handler"]))
+        latency = registry.register(Histogram(
+            "latency_seconds", "Latency.", ["handler"], buckets=(0.1, 1)))
+        calls.inc("tdk")
+        calls.inc("tdk")
+        latency.observe(0.05, "tdk")
+        latency.observe(0.5, "tdk")
+        latency.observe(3, "tdk")
+        text = registry.render()
+        self.assertIn("# TYPE calls_total counter", text)
+        self.assertIn('calls_total{handler="tdk"} 2', text)
+        self.assertIn('latency_seconds_bucket{handler="tdk",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{handler="tdk",le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{handler="tdk",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count{handler="tdk"} 3', text)
+
+    def test_handler_calls_are_counted(self):
+        metrics = bytie.messagehandle.metrics
+        before = metrics.handler_errors.values.get(("ebobekok",), 0)
+        result = bytie.messagehandle.handle_string("ebobekok x")
+        self.assertTrue(result.startswith(bytie.messagehandle.CONFUSED))
+        self.assertEqual(metrics.handler_errors.values[("ebobekok",)], before + 1)
+        self.assertIn('bytie_handler_calls_total{handler="ebobekok"}',
+                      metrics.registry.render())
+
+    def test_endpoint(self):
+        registry = Registry()
+        registry.register(Counter("up_total", "Up.")).inc()
+        server = start_http_server(0, registry=registry)
+        try:
+            port = server.server_address[1]
+            r = requests.get(f"http://127.0.0.1:{port}/metrics", timeout=5)
+            self.assertEqual(r.status_code, 200)
+            self.assertIn("up_total 1", r.text)
+            r = requests.get(f"http://127.0.0.1:{port}/other", timeout=5)
+            self.assertEqual(r.status_code, 404)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import asyncio
+from unittest import TestCase, main
+
+from bytie.outbox import Outbox, pack
+from bytie.ratelimit import TokenBucket
+
+
+class FakeChannel:
+    def __init__(self, id):
+        self.id = id
+        self.sent = []
+
+    async def send(self, content=None, file=None):
+        self.sent.append(content if file is None else ("file", file))
+        await asyncio.sleep(0)
+
+
+class TestPack(TestCase):
+
+    def test_pack(self):
+        text = "\n".join(f"line {i}" for i in range(100))
+        parts = pack(text, 100)
+        self.assertEqual("".join(parts), text)
+        self.assertTrue(all(len(p) <= 100 for p in parts))
+        self.assertTrue(all(p.endswith("\n") for p in parts[:-1]))
+        self.assertEqual(pack("x" * 250, 100), ["x" * 100, "x" * 100, "x" * 50])
+        self.assertEqual(pack("", 100), [])
+
+
+class TestOutbox(TestCase):
+
+    def test_coalesce_and_attach(self):
+        a, b = FakeChannel(1), FakeChannel(2)
+        outbox = Outbox(make_file=lambda data, name: (name, data),
+                        limit=100, attachment_threshold=300, rate=1000, burst=1000)
+
+        async def go():
+            for i in range(5):
+                outbox.put(a, f"reply {i}")
+            outbox.put(b, "y" * 500)
+            await outbox.flush()
+
+        asyncio.run(go())
+        self.assertEqual(a.sent, ["reply 0\nreply 1\nreply 2\nreply 3\nreply 4"])
+        self.assertEqual(b.sent, [("file", ("bytie.txt", b"y" * 500))])
+        self.assertEqual(outbox.pending, {})
+
+
+class TestTokenBucket(TestCase):
+
+    def test_bucket(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=1, capacity=2, clock=lambda: now[0])
+        self.assertTrue(bucket.try_take())
+        self.assertTrue(bucket.try_take())
+        self.assertFalse(bucket.try_take())
+        self.assertAlmostEqual(bucket.delay(), 1.0)
+        now[0] = 1.5
+        self.assertTrue(bucket.try_take())
+        self.assertAlmostEqual(bucket.delay(), 0.5)
+
+
+if __name__ == '__main__':
+    main()
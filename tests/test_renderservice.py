@@ -0,0 +1,140 @@
+import os
+import tempfile
+import threading
+from unittest import TestCase, main
+from unittest.mock import patch
+
+import bytie.messagehandle
+from bytie import renderservice
+from bytie.httpclient import HttpClient
+
+
+class FakeRender:
+    "Writes a placeholder image, after gate is set."
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.views = []
+
+    def __call__(self, view, filepath):
+        self.gate.wait(5)
+        if view["max_iter"] == 13:
+            raise RuntimeError("unlucky")
+        self.views.append(view)
+        with open(filepath, "wb") as f:
+            f.write(b"png")
+
+
+VIEW = {"x": "-0.5", "y": "0", "zoom": 1}
+
+
+class TestRenderService(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.render = FakeRender()
+        self.service = renderservice.RenderService(self.dir.name, queue_limit=3, render=self.render)
+
+    def tearDown(self):
+        self.render.gate.set()
+        self.dir.cleanup()
+
+    def test_identical_views_share_a_job(self):
+        first, = self.service.submit([VIEW])
+        second, same = self.service.submit([{"x": "-0.50", "y": 0, "zoom": "1"}, VIEW])
+        self.assertIs(first, second)
+        self.assertIs(first, same)
+        self.render.gate.set()
+        self.assertEqual(self.service.get(first.id, wait=5).status, renderservice.DONE)
+        self.assertEqual(len(self.render.views), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.dir.name, first.filename)))
+        # a new service finds the image on disk
+        again = renderservice.RenderService(self.dir.name, render=self.render)
+        self.assertEqual(again.submit([VIEW])[0].status, renderservice.DONE)
+
+    def test_removed_image_is_rendered_again(self):
+        self.render.gate.set()
+        job, = self.service.submit([VIEW])
+        self.assertEqual(self.service.get(job.id, wait=5).status, renderservice.DONE)
+        os.remove(os.path.join(self.dir.name, job.filename))
+        again, = self.service.submit([VIEW])
+        self.assertIsNot(again, job)
+        self.assertEqual(self.service.get(again.id, wait=5).status, renderservice.DONE)
+        self.assertTrue(os.path.exists(os.path.join(self.dir.name, again.filename)))
+        self.assertEqual(len(self.render.views), 2)
+
+    def test_queue_limit(self):
+        self.service.submit([dict(VIEW, zoom=z) for z in range(3)])
+        with self.assertRaises(renderservice.QueueFull):
+            self.service.submit([dict(VIEW, zoom=z) for z in range(3, 6)])
+        self.assertEqual(len(self.service.jobs), 3)
+
+    def test_bad_view(self):
+        for view in ({"x": "a", "y": 0, "zoom": 1}, {"y": 0, "zoom": 1}, dict(VIEW, max_iter=0),
+                     dict(VIEW, zoom="nan"), dict(VIEW, zoom="inf"), dict(VIEW, zoom=-2),
+                     dict(VIEW, zoom=10 ** 6), dict(VIEW, max_iter=10 ** 6),
+                     dict(VIEW, div_radius=0), dict(VIEW, div_radius="nan")):
+            with self.assertRaises(ValueError):
+                self.service.submit([view])
+
+    def test_failure_is_reported_and_retried(self):
+        job, = self.service.submit([dict(VIEW, max_iter=13)])
+        self.render.gate.set()
+        self.assertEqual(self.service.get(job.id, wait=5).status, renderservice.FAILED)
+        self.assertEqual(job.error, "unlucky")
+        retry, = self.service.submit([dict(VIEW, max_iter=13)])
+        self.assertIsNot(retry, job)
+
+
+class TestHttp(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.service = renderservice.RenderService(self.dir.name)
+        self.server = renderservice.start_http_server(self.service, 0)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.client = HttpClient()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.dir.cleanup()
+
+    def test_batch_and_polling(self):
+        resp = self.client.post(f"{self.base}/jobs", json={"views": [VIEW, dict(VIEW, zoom=2)]})
+        self.assertEqual(resp.status_code, 202)
+        jobs = resp.json()["jobs"]
+        self.assertEqual(len(jobs), 2)
+        for job in jobs:
+            status = self.client.get(f"{self.base}/jobs/{job['id']}?wait=10", timeout=(3, 20)).json()
+            self.assertEqual(status["status"], "done")
+            image = self.client.get(f"{self.base}/files/{status['file']}")
+            self.assertEqual(image.content[:4], b"\x89PNG")
+        self.assertEqual(self.client.get(f"{self.base}/jobs/nope").status_code, 404)
+        self.assertEqual(self.client.post(f"{self.base}/jobs", json={"x": 1}).status_code, 400)
+
+    def test_handler_submits_to_the_service(self):
+        old = bytie.messagehandle.httpclient.use(self.client)
+        try:
+            with patch.object(bytie.messagehandle, "RENDER_SERVICE", self.base):
+                url = bytie.messagehandle.bytie_handle_mandelbrot("-0.5 0 1 50 4")
+        finally:
+            bytie.messagehandle.httpclient.use(old)
+        filename = url.rsplit("/", 1)[1]
+        self.assertTrue(filename.startswith("mandelbrot_"))
+        self.assertTrue(os.path.exists(os.path.join(self.dir.name, filename)))
+
+    def test_handler_reports_a_bad_view(self):
+        old = bytie.messagehandle.httpclient.use(self.client)
+        try:
+            with patch.object(bytie.messagehandle, "RENDER_SERVICE", self.base):
+                reply = bytie.messagehandle.render_remote({"x": "-0.5", "y": "0", "zoom": -1})
+        finally:
+            bytie.messagehandle.httpclient.use(old)
+        self.assertTrue(reply.startswith("bad view"))
+        self.assertIn("zoom must be between", reply)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import asyncio
+from unittest import TestCase, main
+
+from bytie.scheduler import Scheduler, TOO_BUSY
+
+UNLIMITED = {cost: (1000, 1000) for cost in ("cheap", "normal", "expensive")}
+
+
+def entry(name, cost):
+    return {"name": name, "cost": cost}
+
+
+class TestScheduler(TestCase):
+
+    def test_round_robin_between_users(self):
+        order = []
+
+        async def run(entry, argument):
+            order.append(argument)
+            await asyncio.sleep(0.01)
+            return argument
+
+        async def go():
+            scheduler = Scheduler(run, UNLIMITED, UNLIMITED, {"expensive": (1, 10)})
+            mandel = entry("mandelbrot", "expensive")
+            calls = [scheduler.submit(mandel, f"spam{i}", user="spammer") for i in range(4)]
+            calls.append(scheduler.submit(mandel, "polite", user="polite"))
+            return await asyncio.gather(*calls)
+
+        results = asyncio.run(go())
+        self.assertEqual(results, ["spam0", "spam1", "spam2", "spam3", "polite"])
+        self.assertEqual(order, ["spam0", "spam1", "polite", "spam2", "spam3"])
+
+    def test_load_shedding_and_cheap_bypass(self):
+        release = None
+
+        async def run(entry, argument):
+            if entry["cost"] == "expensive":
+                await release.wait()
+            return argument
+
+        async def go():
+            nonlocal release
+            release = asyncio.Event()
+            scheduler = Scheduler(run, UNLIMITED, UNLIMITED, {"expensive": (1, 2)})
+            mandel = entry("mandelbrot", "expensive")
+            busy = [asyncio.create_task(scheduler.submit(mandel, str(i), user=i)) for i in range(3)]
+            await asyncio.sleep(0)
+            shed = await scheduler.submit(mandel, "4", user=4)
+            cheap = await scheduler.submit(entry("8ball", "cheap"), "fast", user=5)
+            release.set()
+            return shed, cheap, await asyncio.gather(*busy)
+
+        shed, cheap, busy = asyncio.run(go())
+        self.assertEqual(shed, TOO_BUSY)
+        self.assertEqual(cheap, "fast")
+        self.assertEqual(busy, ["0", "1", "2"])
+
+    def test_rate_limit(self):
+        async def run(entry, argument):
+            return argument
+
+        async def go():
+            scheduler = Scheduler(run, {"normal": (0.01, 2)}, UNLIMITED, {"normal": (4, 10)})
+            tdk = entry("tdk", "normal")
+            return [await scheduler.submit(tdk, "kalem", user="u", channel="c") for _ in range(3)]
+
+        results = asyncio.run(go())
+        self.assertEqual(results[:2], ["kalem", "kalem"])
+        self.assertTrue(results[2].startswith("Slow down <@u>!"))
+
+    def test_rejected_call_takes_no_token(self):
+        async def run(entry, argument):
+            return argument
+
+        async def go():
+            scheduler = Scheduler(run, {"normal": (0.01, 2)}, {"normal": (0.01, 1)}, {"normal": (4, 10)})
+            tdk = entry("tdk", "normal")
+            results = [await scheduler.submit(tdk, "kalem", user="u", channel="c") for _ in range(2)]
+            return results, scheduler.buckets[("user", "u", "normal")].tokens
+
+        results, tokens = asyncio.run(go())
+        self.assertEqual(results[0], "kalem")
+        self.assertTrue(results[1].startswith("Slow down everyone!"))
+        self.assertGreaterEqual(tokens, 1)
+
+    def test_chance_is_not_charged_to_the_user(self):
+        async def run(entry, argument):
+            return argument
+
+        async def go():
+            scheduler = Scheduler(run, {"cheap": (0.01, 1)}, UNLIMITED)
+            iplik = entry("iplikisyin", "cheap")
+            chance = [await scheduler.submit(iplik, "x", user="u", channel="c", by_chance=True)
+                      for _ in range(3)]
+            return chance, await scheduler.submit(iplik, "x", user="u", channel="c")
+
+        chance, command = asyncio.run(go())
+        self.assertEqual(chance, ["x", "x", "x"])
+        self.assertEqual(command, "x")
+
+    def test_idle_buckets_are_dropped(self):
+        async def run(entry, argument):
+            return argument
+
+        async def go():
+            scheduler = Scheduler(run, UNLIMITED, UNLIMITED, bucket_ttl=0)
+            for user in range(10):
+                await scheduler.submit(entry("8ball", "cheap"), "?", user=user, channel="c")
+            return len(scheduler.buckets)
+
+        self.assertLessEqual(asyncio.run(go()), 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, main
+
+from bytie.cache import cached
+from bytie.singleflight import SingleFlight
+
+
+class TestSingleFlight(TestCase):
+
+    def burst(self, func, *args, n=8):
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            futures = [pool.submit(func, *args) for _ in range(n)]
+            return [f.exception() or f.result() for f in futures]
+
+    def test_one_upstream_call(self):
+        calls = []
+        release = threading.Event()
+
+        flight = SingleFlight()
+
+        def rate(currency):
+            calls.append(currency)
+            release.wait(5)
+            return 42
+
+        threading.Timer(0.1, release.set).start()
+        self.assertEqual(self.burst(flight.do, "EUR", rate, "eur"), [42] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_error_is_shared(self):
+        calls = []
+
+        flight = SingleFlight()
+
+        def broken():
+            calls.append(1)
+            time.sleep(0.1)
+            raise ValueError("upstream down")
+
+        results = self.burst(flight.do, "broken", broken)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertLess(len(calls), 8)
+
+    def test_cache_misses_are_coalesced(self):
+        calls = []
+
+        @cached(ttl=60)
+        def usd():
+            calls.append(1)
+            time.sleep(0.1)
+            return "32.10"
+
+        self.assertEqual(self.burst(usd), ["32.10"] * 8)
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase, main
+from unittest.mock import patch
+
+import numpy as np
+
+from bytie import mandelbrot, tilecache
+from bytie.tilecache import TileCache
+
+
+class TestTileCache(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.dir.name, "tiles")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_view_matches_direct_render(self):
+        cache = TileCache(self.root, tile=16)
+        shape = (50, 60)
+        result = cache.render(1, (-0.5, 0.1), 60, 4, shape=shape)
+        self.assertEqual(result.shape, shape)
+
+        step = 2 * (2 / 2 ** 1) / (shape[1] - 1)
+        i0 = round(-0.5 / step) - shape[1] // 2
+        j0 = round(0.1 / step) - shape[0] // 2
+        x_range = (i0 + np.arange(shape[1])) * step
+        y_range = (j0 + np.arange(shape[0]))[::-1] * step
+        expected = mandelbrot.mandel_iter(np.meshgrid(x_range, y_range), 60, 4)
+        np.testing.assert_array_equal(result, expected)
+
+    def test_pan_reuses_tiles(self):
+        cache = TileCache(self.root, tile=16)
+        cache.render(1, (-0.5, 0), 40, 4, shape=(48, 48))
+        first = cache.computed
+        cache.render(1, (-0.5 + 4 * 2 / 47, 0), 40, 4, shape=(48, 48))
+        self.assertLessEqual(cache.computed - first, 4)
+        # a fresh cache over the same directory finds the tiles on disk
+        again = TileCache(self.root, tile=16)
+        again.render(1, (-0.5, 0), 40, 4, shape=(48, 48))
+        self.assertEqual(again.computed, 0)
+
+    def test_zoom_in_reuses_the_level_above(self):
+        cache = TileCache(self.root, tile=16)
+        cache.render(3, (-0.7, 0.2), 80, 4, shape=(64, 64))
+        kernel = tilecache.mandelbrot.mandel_iter
+        points = []
+
+        def counting(canvas, *args, **kwargs):
+            points.append(np.size(canvas[0]))
+            return kernel(canvas, *args, **kwargs)
+
+        with patch.object(tilecache.mandelbrot, "mandel_iter", counting):
+            result = cache.render(4, (-0.7, 0.2), 80, 4, shape=(64, 64))
+        fresh = TileCache(os.path.join(self.dir.name, "fresh"), tile=16)
+        np.testing.assert_array_equal(result, fresh.render(4, (-0.7, 0.2), 80, 4, shape=(64, 64)))
+        self.assertEqual(sum(points), (cache.computed - 25) * 16 * 16 * 3 // 4)
+
+    def test_byte_budget(self):
+        cache = TileCache(self.root, tile=16, max_bytes=5000)
+        cache.render(1, (-0.5, 0), 20, 4, shape=(64, 64))
+        on_disk = sum(os.path.getsize(os.path.join(d, f))
+                      for d, _, files in os.walk(self.root) for f in files)
+        self.assertLessEqual(on_disk, 5000)
+        self.assertEqual(on_disk, cache.bytes)
+
+    def test_render_options_have_their_own_tiles(self):
+        cache = TileCache(self.root, tile=16)
+        cache.render(1, (-0.5, 0), 20, 4, shape=(32, 32))
+        computed = cache.computed
+        cache.render(1, (-0.5, 0), 20, 4, shape=(32, 32), method="escape", periodicity=False)
+        self.assertEqual(cache.computed, computed)
+        for options in ({"method": "mariani"}, {"periodicity": True}, {"interior_check": True}):
+            cache.render(1, (-0.5, 0), 20, 4, shape=(32, 32), **options)
+        self.assertEqual(cache.computed, 4 * computed)
+        self.assertEqual(len(os.listdir(os.path.join(self.root, os.listdir(self.root)[0]))), 4)
+
+    def test_directory_removed(self):
+        cache = TileCache(self.root, tile=16)
+        cache.render(1, (-0.5, 0), 20, 4, shape=(64, 64))
+        shutil.rmtree(self.root)
+        computed = cache.computed
+        cache.render(3, (-0.5, 0.5), 20, 4, shape=(32, 32))
+        on_disk = sum(os.path.getsize(os.path.join(d, f))
+                      for d, _, files in os.walk(self.root) for f in files)
+        self.assertEqual(on_disk, cache.bytes)
+        self.assertEqual(len(cache.index), cache.computed - computed)
+
+
+if __name__ == '__main__':
+    main()